@@ -0,0 +1,77 @@
+# Compares the XmlReader based device(root=...) with the single-pass 
+# parse_device() on large multi-device descriptions.
+#
+# Run from the repository root: python -m benchmarks.desc_parse
+import sys
+import timeit
+import xml.etree.ElementTree as xmltree
+
+import upnplib.all as upnplib
+
+NS = 'urn:schemas-upnp-org:device-1-0'
+
+def service(index: int) -> str:
+  return (
+    '<service><serviceType>urn:schemas-upnp-org:service:Bench%d:1</serviceType>'
+    '<serviceId>urn:upnp-org:serviceId:Bench%d</serviceId>'
+    '<SCPDURL>/scpd/bench%d.xml</SCPDURL><controlURL>/control/bench%d</controlURL>'
+    '<eventSubURL>/event/bench%d</eventSubURL></service>' % ((index,) * 5)
+  )
+
+def icon(size: int) -> str:
+  return (
+    '<icon><mimetype>image/png</mimetype><width>%d</width><height>%d</height>'
+    '<depth>24</depth><url>/icon%d.png</url></icon>' % (size, size, size)
+  )
+
+def device(name: str, services: int, children: int, depth: int) -> str:
+  embedded = ''
+  if depth > 0 and children:
+    embedded = '<deviceList>%s</deviceList>' % ''.join(
+      device('%s.%d' % (name, i), services, children, depth - 1) for i in range(children)
+    )
+  return (
+    '<device><deviceType>urn:schemas-upnp-org:device:Bench:1</deviceType>'
+    '<friendlyName>bench %s</friendlyName><manufacturer>upnplib</manufacturer>'
+    '<modelName>bench</modelName><UDN>uuid:%s</UDN>'
+    '<iconList>%s</iconList><serviceList>%s</serviceList>%s</device>' % (
+      name, name, ''.join(icon(s) for s in (48, 120)), 
+      ''.join(service(i) for i in range(services)), embedded
+    )
+  )
+
+def description(services: int, children: int, depth: int) -> bytes:
+  return ('<?xml version="1.0"?><root xmlns="%s"><specVersion><major>1</major>'
+          '<minor>0</minor></specVersion>%s</root>' % (
+            NS, device('0', services, children, depth))).encode('utf-8')
+
+def flatten(dev) -> list:
+  # comparable view of a device tree
+  result = [(dict(dev._attrib), [repr(i) for i in dev.iconList], [
+    (str(s.service_type), str(s.sid), s.scpd_url, s.control_url, s.event_url, s.url_base)
+    for s in dev.serviceList or []
+  ])]
+  for child in dev.deviceList:
+    result.extend(flatten(child))
+  return result
+
+def main(repeat: int = 5) -> None:
+  url = 'http://192.168.0.1:49000/desc.xml'
+  for services, children, depth in ((4, 0, 0), (10, 3, 2), (20, 4, 3)):
+    root = xmltree.fromstring(description(services, children, depth))
+    old = upnplib.device('192.168.0.1', 49000, url, root=root)
+    new = upnplib.parse_device('192.168.0.1', 49000, url, root)
+    assert flatten(old) == flatten(new)
+
+    number = max(1, 2000 // len(flatten(new)))
+    t_old = min(timeit.repeat(
+      lambda: upnplib.device('192.168.0.1', 49000, url, root=root), number=number, repeat=repeat))
+    t_new = min(timeit.repeat(
+      lambda: upnplib.parse_device('192.168.0.1', 49000, url, root), number=number, repeat=repeat))
+    print('%4d devices, %5d services: device() %8.3f ms, parse_device() %8.3f ms, %.1fx' % (
+      len(flatten(new)), sum(len(d[2]) for d in flatten(new)),
+      t_old / number * 1000, t_new / number * 1000, t_old / t_new
+    ))
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
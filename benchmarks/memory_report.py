@@ -0,0 +1,141 @@
+# Memory held by the parsed descriptions and SCPDs of a synthetic fleet.
+#
+# Every device is parsed from its own documents, as in a real crawl, and all
+# results are kept alive while tracemalloc measures them. SSDP search 
+# responses of the fleet are collected into an ssdpresult as well.
+#
+# The fleet is built twice: once as a baseline with interning, the shared
+# urn cache and __slots__ switched off, and once with the library as is.
+#
+# Run from the repository root: python -m benchmarks.memory_report [devices]
+import contextlib
+import gc
+import importlib
+import sys
+import tracemalloc
+import xml.etree.ElementTree as xmltree
+
+import upnplib.all as upnplib
+
+from .desc_parse import description
+
+SERVICE_NS = 'urn:schemas-upnp-org:service-1-0'
+
+# modules holding the slotted classes and the interning call sites
+PATCHED = [importlib.import_module(name) for name in (
+  'upnplib.desc.scpd', 'upnplib.desc.upnpdev', 'upnplib.desc.urnobj',
+  'upnplib.ssdp.agent', 'upnplib.ssdp.message'
+)]
+
+def scpd_document(index: int, actions: int = 24) -> bytes:
+  # shaped like a WANIPConnection: A_ARG_TYPE_* variables, in/out arguments
+  variables = ''.join(
+    '<stateVariable sendEvents="no"><name>A_ARG_TYPE_Value%d</name>'
+    '<dataType>%s</dataType><allowedValueList><allowedValue>yes</allowedValue>'
+    '<allowedValue>no</allowedValue></allowedValueList></stateVariable>' % (
+      i, ('string', 'ui2', 'boolean', 'ui4')[i % 4]
+    ) for i in range(actions)
+  )
+  action_list = ''.join(
+    '<action><name>GetValue%d</name><argumentList>'
+    '<argument><name>NewIndex</name><direction>in</direction>'
+    '<relatedStateVariable>A_ARG_TYPE_Value%d</relatedStateVariable></argument>'
+    '<argument><name>NewValue</name><direction>out</direction>'
+    '<relatedStateVariable>A_ARG_TYPE_Value%d</relatedStateVariable></argument>'
+    '</argumentList></action>' % (i, i, (i + 1) % actions) for i in range(actions)
+  )
+  return ('<?xml version="1.0"?><scpd xmlns="%s"><specVersion><major>1</major>'
+          '<minor>0</minor></specVersion><actionList>%s</actionList>'
+          '<serviceStateTable>%s</serviceStateTable></scpd>' % (
+            SERVICE_NS, action_list, variables)).encode('utf-8')
+
+def search_response(index: int, service: int) -> bytes:
+  return (
+    'HTTP/1.1 200 OK\r\nCACHE-CONTROL: max-age=1800\r\nEXT:\r\n'
+    'LOCATION: http://10.%d.%d.%d:49000/desc.xml\r\nSERVER: Linux UPnP/1.0 bench/1.0\r\n'
+    'ST: urn:schemas-upnp-org:service:Bench%d:1\r\n'
+    'USN: uuid:%08d-0000-0000-0000-000000000000::urn:schemas-upnp-org:service:Bench%d:1\r\n\r\n' % (
+      index >> 16 & 255, index >> 8 & 255, index & 255, service, index, service
+    )
+  ).encode('utf-8')
+
+def build(devices: int, services: int = 4) -> list:
+  desc = description(services, 0, 0)
+  documents = [scpd_document(i) for i in range(services)]
+  fleet = []
+  result = upnplib.ssdpresult()
+  for index in range(devices):
+    host = '10.%d.%d.%d' % (index >> 16 & 255, index >> 8 & 255, index & 255)
+    url = 'http://%s:49000/desc.xml' % host
+    # bytes(...) copies, so that nothing is shared between devices by accident
+    dev = upnplib.parse_device(host, 49000, url, xmltree.fromstring(bytes(desc)))
+    scpds = [
+      upnplib.scpd(service, xmltree.fromstring(bytes(documents[i])))
+      for i, service in enumerate(dev.serviceList)
+    ]
+    for service in range(services):
+      message = upnplib.Message(raw_data=search_response(index, service))
+      for name in ('ST', 'USN', 'LOCATION', 'SERVER', 'CACHE-CONTROL'):
+        message[name]
+      result.add(message, host)
+    fleet.append((dev, scpds))
+  return [fleet, result]
+
+def _unslotted(cls: type) -> type:
+  # same class with its attributes in an instance __dict__
+  slots = set(cls.__dict__.get('__slots__', ()))
+  body = {k: v for k, v in cls.__dict__.items() if k != '__slots__' and k not in slots}
+  return type(cls.__name__, cls.__bases__, body)
+
+@contextlib.contextmanager
+def baseline():
+  """Disable interning, the shared urn cache and __slots__ while active."""
+  unslotted = {}
+  for module in PATCHED:
+    for name, value in vars(module).items():
+      if isinstance(value, type) and '__slots__' in value.__dict__ and value.__module__ == module.__name__:
+        unslotted[name] = _unslotted(value)
+  patches = [(module, '_intern', lambda value: value) for module in PATCHED if hasattr(module, '_intern')]
+  for module in PATCHED:
+    patches += [(module, name, cls) for name, cls in unslotted.items() if hasattr(module, name)]
+  patches.append((sys.modules['upnplib.desc.upnpdev'], '_shared_urn', unslotted['urn']))
+  saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+  try:
+    for module, name, value in patches:
+      setattr(module, name, value)
+    yield
+  finally:
+    for module, name, value in saved:
+      setattr(module, name, value)
+
+def measure(devices: int) -> tuple:
+  gc.collect()
+  tracemalloc.start()
+  fleet = build(devices)
+  gc.collect()
+  current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return fleet, current, peak
+
+def report(label: str, devices: int, current: int, peak: int) -> None:
+  print('%-9s %.1f MB held (%.1f KB per device), peak %.1f MB' % (
+    label + ':', current / 1e6, current / devices / 1e3, peak / 1e6
+  ))
+
+def main(devices: int = 500) -> None:
+  with baseline():
+    fleet, before, before_peak = measure(devices)
+  del fleet
+  fleet, current, peak = measure(devices)
+  objects = sum(
+    len(s.svars) + len(s.actionList) + sum(
+      len(a.in_arguments) + len(a.out_arguments) for a in s.actionList.values()
+    ) for _, scpds in fleet[0] for s in scpds
+  )
+  print('%d devices, %d variables/actions/arguments' % (devices, objects))
+  report('baseline', devices, before, before_peak)
+  report('current', devices, current, peak)
+  print('saved:    %.1f MB (%.0f%%)' % ((before - current) / 1e6, 100.0 * (before - current) / before))
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from upnplib.cache import diskcache, docentry
+
+URL = 'http://127.0.0.1:49000/desc.xml'
+DOCUMENT = b'<?xml version="1.0"?><root xmlns="urn:schemas-upnp-org:device-1-0"/>'
+
+class DiskCacheTest(unittest.TestCase):
+
+  def setUp(self) -> None:
+    self._dir = tempfile.TemporaryDirectory()
+    self.path = self._dir.name
+
+  def tearDown(self) -> None:
+    self._dir.cleanup()
+
+  def test_put_unchanged_document_keeps_blob(self) -> None:
+    # a 304 revalidation stores the same document under the same url again
+    with diskcache(self.path) as cache:
+      cache.put(docentry(URL, DOCUMENT, etag='"1"'))
+      cache.put(docentry(URL, DOCUMENT, etag='"1"'))
+      self.assertEqual(len(os.listdir(os.path.join(self.path, 'objects'))), 1)
+
+    entry = diskcache(self.path).get(URL)
+    self.assertIsNotNone(entry)
+    self.assertEqual(entry.data, DOCUMENT)
+
+  def test_put_changed_document_replaces_blob(self) -> None:
+    with diskcache(self.path) as cache:
+      cache.put(docentry(URL, DOCUMENT))
+      cache.put(docentry(URL, DOCUMENT + b' '))
+      self.assertEqual(len(os.listdir(os.path.join(self.path, 'objects'))), 1)
+      self.assertEqual(cache.size, len(DOCUMENT) + 1)
+
+    self.assertEqual(diskcache(self.path).get(URL).data, DOCUMENT + b' ')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -42,6 +42,9 @@ class MSearchImpl(upnp.UModule):
     packets = []
     urls = []
     hosts = []
+    # sets for constant time lookups, the lists keep the order
+    known_urls = set()
+    known_hosts = set()
 
     for raw_bytes in upnp.msearch(client=cl):
       socket_address = raw_bytes[1]
@@ -49,10 +52,12 @@ class MSearchImpl(upnp.UModule):
       location = packet.get(upnp.low.ssdp.NOTIFY_LOCATION)
       serv = packet.get(upnp.low.ssdp.NOTIFY_SERVER)
 
-      if location and not upnp.__is_located__(location, urls, lambda x, y: y[1].__eq__(x)):
+      if location and location not in known_urls:
+        known_urls.add(location)
         urls.append((socket_address[0], location))
 
-      if not upnp.__is_located__(socket_address, hosts, lambda x, y: x[0] == y[0]):
+      if socket_address[0] not in known_hosts:
+        known_hosts.add(socket_address[0])
         if not serv:
           serv = '[!] Warning: No specific UPnP-Service(s) found.'
         hosts.append((socket_address[0], serv))
@@ -1,3 +1,5 @@
+from .pool import *
+from .cache import *
 from .desc import *
 from .ssdp import *
 from .soap import *
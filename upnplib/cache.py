@@ -0,0 +1,487 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Caches for description and SCPD documents. Documents are revalidated with 
+conditional requests (ETag / Last-Modified); an unchanged CONFIGID.UPNP.ORG
+announced by the device is treated as proof that a cached document is still
+fresh, so no request is made at all.
+
+diskcache keeps the documents between runs in a content-addressed directory,
+so a new process can rebuild known devices without any network round trip.
+"""
+import atexit
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib3
+import weakref
+import zlib
+
+from .pool import httppools, shared_pools
+from .utils import discard_response
+
+__all__ = [
+  'cachestats', 'docentry', 'doccache', 'diskcache',
+  'shared_cache', 'set_shared_cache'
+]
+
+def read_limited(response: urllib3.HTTPResponse, maxbytes: int) -> bytes:
+  """Reads the body of a response requested with preload_content=False.
+
+  ValueError is raised as soon as the body exceeds maxbytes bytes, the 
+  connection is closed then instead of being reused.
+  """
+  chunks = []
+  size = 0
+  try:
+    for chunk in response.stream(65536):
+      size += len(chunk)
+      if size > maxbytes:
+        raise ValueError('Document is larger than %d bytes' % maxbytes)
+      chunks.append(chunk)
+  except Exception:
+    response.close()
+    raise
+  finally:
+    response.release_conn()
+  return b''.join(chunks)
+
+class cachestats:
+  """Counters of a doccache."""
+  def __init__(self) -> None:
+    self.fresh = 0
+    self.revalidated = 0
+    self.fetched = 0
+    self.failed = 0
+
+  @property
+  def requests(self) -> int:
+    """Amount of lookups that needed at least one HTTP request."""
+    return self.revalidated + self.fetched + self.failed
+
+  def __repr__(self) -> str:
+    return '<cachestats fresh=%d, revalidated=%d, fetched=%d, failed=%d>' % (
+      self.fresh, self.revalidated, self.fetched, self.failed
+    )
+
+class docentry:
+  """A cached document together with its validators."""
+  def __init__(self, url: str, data: bytes, source: str = None, etag: str = None,
+               last_modified: str = None, configid: str = None) -> None:
+    self.url = url
+    self.data = data
+    # the url the document was actually fetched from (see fuzz_locate())
+    self.source = source or url
+    self.etag = etag
+    self.last_modified = last_modified
+    self.configid = configid
+    self.fetched = time.time()
+
+  def validators(self) -> dict:
+    headers = {}
+    if self.etag: headers['If-None-Match'] = self.etag
+    if self.last_modified: headers['If-Modified-Since'] = self.last_modified
+    return headers
+
+  def __repr__(self) -> str:
+    return '<docentry url="%s", size=%d, etag=%s, configid=%s>' % (
+      self.url, len(self.data), self.etag, self.configid
+    )
+
+class doccache:
+  """In-memory document cache keyed by URL with at most maxsize entries.
+
+  fetch() returns the document of an url in one of these ways:
+
+  1. the cached entry, without any request, if configid is given and equal 
+     to the CONFIGID the entry was stored with, or if the entry is younger 
+     than maxage seconds,
+  2. the cached entry after the server answered a conditional GET with 
+     304 Not Modified,
+  3. a freshly downloaded document through fetcher, a callable taking the 
+     url and returning a (source_url, response) tuple.
+
+  >>> cache = doccache()
+  >>> client = Client(device, cache=cache, configid=entry.configid)
+  >>> cache.stats
+  <cachestats fresh=2, revalidated=0, fetched=0, failed=0>
+  """
+  def __init__(self, maxsize: int = 1024, pools: httppools = None,
+               maxage: float = None) -> None:
+    self._maxsize = maxsize
+    self._pools = pools
+    self._maxage = maxage
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._stats = cachestats()
+
+  @property
+  def stats(self) -> cachestats:
+    return self._stats
+
+  @property
+  def pools(self) -> httppools:
+    return self._pools if self._pools is not None else shared_pools()
+
+  def get(self, url: str) -> docentry:
+    with self._lock:
+      entry = self._entries.get(url)
+      if entry is not None:
+        self._entries.move_to_end(url)
+      return entry
+
+  def put(self, entry: docentry) -> None:
+    with self._lock:
+      self._entries[entry.url] = entry
+      self._entries.move_to_end(entry.url)
+      while len(self._entries) > self._maxsize:
+        self._entries.popitem(last=False)
+
+  def fetch(self, url: str, configid: str = None, fetcher = None, 
+            timeout: float = None, manager = None, 
+            maxbytes: int = None) -> bytes: # bytes | None
+    """Returns the document located at url or None if it could not be fetched.
+
+    Requests are sent through manager if given, otherwise through the pools 
+    of this cache. If maxbytes is given, bodies are read in chunks and 
+    ValueError is raised as soon as one exceeds maxbytes; fetcher then has
+    to return responses that were requested with preload_content=False.
+    """
+    preload = maxbytes is None
+    entry = self.get(url)
+    if entry is not None:
+      if self._isfresh(entry, configid):
+        self._count('fresh')
+        return entry.data
+
+      response = self._request(entry.source, entry.validators(), timeout, manager, preload)
+      if response is not None and response.status == 304:
+        if not preload: response.release_conn()
+        entry.configid = configid if configid is not None else entry.configid
+        entry.fetched = time.time()
+        self.put(entry)
+        self._count('revalidated')
+        return entry.data
+      if response is not None and response.status == 200:
+        return self._store(url, entry.source, response, configid, maxbytes)
+      if response is not None and not preload:
+        discard_response(response)
+
+    if fetcher is not None:
+      source, response = fetcher(url)
+    else:
+      source, response = url, self._request(url, None, timeout, manager, preload)
+    if response is None or response.status != 200:
+      if response is not None and not preload:
+        discard_response(response)
+      self._count('failed')
+      return None
+    return self._store(url, source, response, configid, maxbytes)
+
+  def _isfresh(self, entry: docentry, configid: str) -> bool:
+    if configid is not None and entry.configid == configid:
+      return True
+    return self._maxage is not None and time.time() - entry.fetched < self._maxage
+
+  def _count(self, name: str) -> None:
+    with self._lock:
+      setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+  def _request(self, url: str, headers: dict, timeout: float, manager,
+               preload: bool = True) -> urllib3.HTTPResponse:
+    kwds = {'timeout': timeout} if timeout is not None else {}
+    manager = manager if manager is not None else self.pools
+    try:
+      return manager.request('GET', url, headers=headers, preload_content=preload, **kwds)
+    except Exception:
+      return None
+
+  def _store(self, url: str, source: str, response: urllib3.HTTPResponse,
+             configid: str, maxbytes: int = None) -> bytes:
+    data = response.data if maxbytes is None else read_limited(response, maxbytes)
+    self._count('fetched')
+    entry = docentry(
+      url, data, source, 
+      response.headers.get('ETag'), response.headers.get('Last-Modified'), 
+      configid
+    )
+    self.put(entry)
+    return entry.data
+
+  def invalidate(self, url: str = None) -> None:
+    """Removes the entry of url or all entries if no url is given."""
+    with self._lock:
+      if url is None:
+        self._entries.clear()
+      else:
+        self._entries.pop(url, None)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __contains__(self, url: str) -> bool:
+    return url in self._entries
+
+  def __repr__(self) -> str:
+    return '<doccache entries=%d, maxsize=%d>' % (len(self), self._maxsize)
+
+class diskcache(doccache):
+  """doccache that persists all documents below path.
+
+  Documents are stored once per content under objects/<sha256>, optionally 
+  zlib compressed; index.json maps each URL to its document and validators.
+  If the stored documents exceed maxbytes, the least recently used URLs are
+  dropped together with documents no other URL refers to. 
+
+  The index is written every batch changes, by flush() (e.g. when used as 
+  a context manager) and at exit; documents not listed in the index are 
+  removed when the cache is opened again.
+
+  Lookups that miss the in-memory entries are answered from disk, so with 
+  a known configid (or maxage) a cold process needs no requests at all:
+
+  >>> with diskcache('~/.cache/upnplib', compress=True) as cache:
+  ...   set_shared_cache(cache)
+  ...   device = new_device(location, configid=entry.configid)
+  ...   client = Client(device, configid=entry.configid)
+  """
+  def __init__(self, path: str, maxbytes: int = 64 << 20, compress: bool = False,
+               maxsize: int = 1024, pools: httppools = None, 
+               maxage: float = None, batch: int = 256) -> None:
+    super().__init__(maxsize, pools, maxage)
+    self._path = os.path.expanduser(path)
+    self._maxbytes = maxbytes
+    self._compress = compress
+    self._batch = batch
+    self._dirty = 0
+    self._disklock = threading.RLock()
+    os.makedirs(os.path.join(self._path, 'objects'), exist_ok=True)
+
+    # (digest, compressed) -> [references, stored size]
+    self._refs = {}
+    self._total = 0
+    self._index = collections.OrderedDict()
+    with self._disklock:
+      for url, record in self._load_index().items():
+        self._link(url, record)
+      self._collect()
+      # maxbytes may be lower than in the run that filled the cache
+      self._evict()
+    # pending index changes are written at exit, too
+    ref = weakref.ref(self)
+    atexit.register(lambda: ref() is not None and ref().flush())
+
+  @property
+  def path(self) -> str:
+    return self._path
+
+  @property
+  def size(self) -> int:
+    """Amount of bytes used by the stored documents."""
+    return self._total
+
+  def get(self, url: str) -> docentry:
+    entry = super().get(url)
+    if entry is not None:
+      self._touch(url)
+      return entry
+
+    with self._disklock:
+      record = self._index.get(url)
+      if record is None:
+        return None
+      data = self._read_blob(record['digest'], record.get('compressed', False))
+      if data is None:
+        # missing or damaged document, forget about it
+        self._unlink(url)
+        self._changed()
+        return None
+      self._index.move_to_end(url)
+
+    entry = docentry(url, data, record.get('source'), record.get('etag'),
+                     record.get('last_modified'), record.get('configid'))
+    entry.fetched = record.get('fetched', 0)
+    super().put(entry)
+    return entry
+
+  def put(self, entry: docentry) -> None:
+    super().put(entry)
+    digest = hashlib.sha256(entry.data).hexdigest()
+    with self._disklock:
+      size = self._write_blob(digest, entry.data)
+      self._link(entry.url, {
+        'digest': digest, 'size': size, 'compressed': self._compress,
+        'source': entry.source, 'etag': entry.etag, 
+        'last_modified': entry.last_modified, 'configid': entry.configid,
+        'fetched': entry.fetched
+      })
+      self._evict()
+      self._changed()
+
+  def invalidate(self, url: str = None) -> None:
+    super().invalidate(url)
+    with self._disklock:
+      for name in list(self._index) if url is None else [url]:
+        self._unlink(name)
+      self._save_index()
+
+  def flush(self) -> None:
+    """Writes the index including the current LRU order to disk."""
+    with self._disklock:
+      self._save_index()
+
+  def __enter__(self) -> 'diskcache':
+    return self
+
+  def __exit__(self, e_type, e, traceback):
+    self.flush()
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+  def __contains__(self, url: str) -> bool:
+    return url in self._index
+
+  def __repr__(self) -> str:
+    return '<diskcache path="%s", entries=%d, maxbytes=%d>' % (
+      self._path, len(self), self._maxbytes
+    )
+
+  def _touch(self, url: str) -> None:
+    with self._disklock:
+      if url in self._index:
+        self._index.move_to_end(url)
+
+  def _changed(self) -> None:
+    self._dirty += 1
+    if self._dirty >= self._batch:
+      self._save_index()
+
+  def _link(self, url: str, record: dict) -> None:
+    key = (record['digest'], record.get('compressed', False))
+    refs = self._refs.get(key)
+    if refs is None:
+      self._refs[key] = [1, record['size']]
+      self._total += record['size']
+    else:
+      refs[0] += 1
+    # released after the new reference is taken, an unchanged document
+    # (e.g. after a 304) must not be removed from disk
+    self._unlink(url)
+    self._index[url] = record
+
+  def _unlink(self, url: str) -> None:
+    record = self._index.pop(url, None)
+    if record is None: return
+    key = (record['digest'], record.get('compressed', False))
+    refs = self._refs[key]
+    refs[0] -= 1
+    if refs[0] == 0:
+      # no other URL refers to this document anymore
+      del self._refs[key]
+      self._total -= refs[1]
+      try:
+        os.remove(self._blob_path(*key))
+      except OSError:
+        pass
+
+  def _evict(self) -> None:
+    # the most recently used entry is always kept
+    while self._total > self._maxbytes and len(self._index) > 1:
+      url = next(iter(self._index))
+      super().invalidate(url)
+      self._unlink(url)
+
+  def _collect(self) -> None:
+    # removes documents no URL refers to, e.g. after a run without flush()
+    objects = os.path.join(self._path, 'objects')
+    for name in os.listdir(objects):
+      digest, _, suffix = name.partition('.')
+      if (digest, suffix == 'z') not in self._refs:
+        try:
+          os.remove(os.path.join(objects, name))
+        except OSError:
+          pass
+
+  def _blob_path(self, digest: str, compressed: bool) -> str:
+    return os.path.join(self._path, 'objects', digest + ('.z' if compressed else ''))
+
+  def _write_blob(self, digest: str, data: bytes) -> int:
+    refs = self._refs.get((digest, self._compress))
+    if refs is not None:
+      return refs[1]
+    path = self._blob_path(digest, self._compress)
+    if not os.path.exists(path):
+      if self._compress:
+        data = zlib.compress(data)
+      self._write_file(path, data)
+    return os.path.getsize(path)
+
+  def _read_blob(self, digest: str, compressed: bool) -> bytes: # bytes | None
+    try:
+      with open(self._blob_path(digest, compressed), 'rb') as fp:
+        data = fp.read()
+      if compressed:
+        data = zlib.decompress(data)
+    except (OSError, zlib.error):
+      return None
+    if hashlib.sha256(data).hexdigest() != digest:
+      return None
+    return data
+
+  def _load_index(self) -> collections.OrderedDict:
+    try:
+      with open(os.path.join(self._path, 'index.json'), 'r', encoding='utf-8') as fp:
+        records = json.load(fp)
+    except (OSError, ValueError):
+      return collections.OrderedDict()
+    # stored from least to most recently used
+    return collections.OrderedDict((r.pop('url'), r) for r in records if 'url' in r)
+
+  def _save_index(self) -> None:
+    self._dirty = 0
+    records = [dict(record, url=url) for url, record in self._index.items()]
+    self._write_file(
+      os.path.join(self._path, 'index.json'), json.dumps(records).encode('utf-8')
+    )
+
+  def _write_file(self, path: str, data: bytes) -> None:
+    # write and rename, so other processes never see partial files
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'wb') as fp:
+      fp.write(data)
+    os.replace(temp, path)
+
+_shared = None
+
+def shared_cache() -> doccache: # doccache | None
+  """Returns the process-wide document cache, None unless one was set."""
+  return _shared
+
+def set_shared_cache(cache: doccache) -> doccache:
+  """Sets the cache new_device() and Client use by default and returns the old one."""
+  global _shared
+  old, _shared = _shared, cache
+  return old
@@ -19,16 +19,17 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-import urllib3
 import xml.etree.ElementTree as xmltree
 
 from .. import all as upnplib
+from ..pool import httppools, shared_pools
 from typing import Iterator
 
 class Callable:
   def __init__(self, action: upnplib.Action, service: upnplib.urn,
-               url: str, manager: urllib3.PoolManager) -> None:
-    self._manager = manager
+               url: str, manager: httppools = None, headers: dict = None) -> None:
+    self._manager = manager if manager is not None else shared_pools()
+    self._headers = headers
     self._action = action
     self._service = service
     self._url = url
@@ -46,7 +47,7 @@ class Callable:
       envelope = upnplib.Envelope(body)
       body = repr(envelope).encode('utf-8')
 
-      response = self._manager.request('POST', self._url, body=body)
+      response = self._manager.request('POST', self._url, body=body, headers=self._headers)
       root = xmltree.fromstring(response.data)
 
       result = upnplib.Envelope(root=root)
@@ -67,7 +68,10 @@ class Callable:
     return self._action.name
 
 class SubService:
-  def __init__(self, device: upnplib.device, ser_desc: upnplib.scpd) -> None:
+  def __init__(self, device: upnplib.device, ser_desc: upnplib.scpd, 
+               pools: httppools = None) -> None:
+    # all actions share the keep-alive pool of the device's host
+    pools = pools if pools is not None else shared_pools()
     self._scpd = ser_desc
     self._device = device
     self._subactions = []
@@ -84,7 +88,7 @@ class SubService:
       sub_action = Callable(
         action, service.service_type, 
         '%s/%s' % (target, service.control_url.strip('/')), 
-        urllib3.PoolManager(headers=head)
+        pools, head
       )
       setattr(self, action_name, sub_action)
       self._subactions.append(sub_action)
@@ -19,37 +19,168 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import concurrent.futures
+import threading
 import xml.etree.ElementTree as xmltree
 
 from .. import all as upnplib
-from ..utils import fuzz_request
+from ..cache import shared_cache
+from ..desc.stream import MAX_DOCUMENT_BYTES, _consume
+from ..pool import httppools, shared_pools
+from ..utils import fuzz_request, fuzz_locate
 from . import SubService
 
 class Client:
-  def __init__(self, device: upnplib.device) -> None:
+  """Client for the services of a device and all of its embedded devices.
+
+  Services are available as attributes named by their service id, e.g.
+  client.WANIPConn1. By default all SCPD documents are fetched in the 
+  constructor. With lazy set, the constructor makes no requests at all; 
+  a service's SCPD is fetched on first access to it instead, and prefetch 
+  additionally loads all services in a background thread:
+
+  >>> client = Client(device, lazy=True)
+  >>> client.WANIPConn1.GetExternalIPAddress()  # fetches only this SCPD
+
+  Loading more than one service at once (eager construction, services() and
+  prefetch) fetches up to workers SCPD documents concurrently. Services are 
+  kept in the order of the device description regardless, and services 
+  that could not be loaded are listed in errors.
+  """
+  def __init__(self, device: upnplib.device, pools: httppools = None,
+               cache = None, configid: str = None, lazy: bool = False,
+               prefetch: bool = False, workers: int = 8, 
+               stream: bool = False) -> None:
     self._device = device
+    self._pools = pools if pools is not None else shared_pools()
+    # optional doccache for SCPD documents, see upnplib.cache
+    self._cache = cache if cache is not None else shared_cache()
+    self._configid = configid
+    self._workers = workers
+    # parse SCPD documents with upnplib.read_scpd() (size caps, no full tree)
+    self._stream = stream
     self._services = {}
+    # placeholders of services not loaded yet: name -> (device, service, model)
+    self._pending = {}
+    self._loading = {}
+    self._order = []
+    self._errors = {}
+    self._lock = threading.Lock()
+    self._prefetcher = None
     self._load_device(device)
+    if not lazy:
+      self.services()
+    elif prefetch:
+      self.prefetch()
+
+  @property
+  def errors(self) -> dict:
+    """Services that could not be loaded: name -> exception."""
+    return self._errors
 
   def services(self) -> dict:
+    """Returns all services, loading the ones that were not accessed yet."""
+    names = list(self._pending)
+    if len(names) > 1 and self._workers > 1:
+      with concurrent.futures.ThreadPoolExecutor(
+          max_workers=min(self._workers, len(names))) as executor:
+        list(executor.map(self._load, names))
+    else:
+      for name in names:
+        self._load(name)
+
+    with self._lock:
+      # completion order differs between runs, the description's does not
+      self._services = {n: self._services[n] for n in self._order if n in self._services}
     return self._services
 
-  def _load_device(self, device: upnplib.device):
-    # preventing more than one executions of this method
-    if len(self._services) != 0: return
+  def prefetch(self) -> threading.Thread:
+    """Loads all pending services in a background thread."""
+    if self._prefetcher is None:
+      self._prefetcher = threading.Thread(
+        target=self.services, name='upnplib-prefetch', daemon=True
+      )
+      self._prefetcher.start()
+    return self._prefetcher
 
-    for service in device.serviceList:
-      url_base = '%s/%s' % (device.base_url.strip('/'), service.scpd_url.strip('/'))
-      response = fuzz_request(url_base)
-      if response is not None and response.status == 200:
-        if response.data:
-          s_desc = upnplib.scpd(service, xmltree.fromstring(response.data))
-          serv = upnplib.SubService(device, s_desc)
-
-          setattr(self, service.sid.device_type, serv)
-          self._services[service.sid.device_type] = serv
+  def _load_device(self, device: upnplib.device):
+    # devices of the same model share their url layout (see fuzz_locate())
+    model = tuple(device[k] if k in device else None for k in ('manufacturer', 'modelName'))
+    for service in device.serviceList or []:
+      name = service.sid.device_type
+      if name not in self._pending:
+        self._pending[name] = (device, service, model)
+        self._order.append(name)
     for dev in device.deviceList:
       self._load_device(dev)
+
+  def _load(self, name: str) -> SubService: # SubService | None
+    with self._lock:
+      if name in self._services:
+        return self._services[name]
+      if name not in self._pending:
+        return None
+      future = self._loading.get(name)
+      owner = future is None
+      if owner:
+        future = self._loading[name] = concurrent.futures.Future()
+    if not owner:
+      # another thread (e.g. the prefetcher) is already loading it
+      return future.result()
+
+    device, service, model = self._pending[name]
+    serv, error = None, None
+    try:
+      url_base = '%s/%s' % (device.base_url.strip('/'), service.scpd_url.strip('/'))
+      if self._stream and self._cache is None:
+        # parsed while it is received, the size caps apply to the download
+        _, response = fuzz_locate(url_base, self._pools, model, preload=False)
+        if response is None:
+          raise ConnectionError('Could not fetch the SCPD of %s from %s' % (name, url_base))
+        s_desc = _consume(response, lambda body: upnplib.read_scpd(service, body))
+      else:
+        data = self._fetch(url_base, model)
+        if not data:
+          raise ConnectionError('Could not fetch the SCPD of %s from %s' % (name, url_base))
+        if self._stream:
+          s_desc = upnplib.read_scpd(service, data)
+        else:
+          s_desc = upnplib.scpd(service, xmltree.fromstring(data))
+      serv = upnplib.SubService(device, s_desc, self._pools)
+    except Exception as e:
+      error = e
+    finally:
+      with self._lock:
+        del self._pending[name]
+        del self._loading[name]
+        if serv is not None:
+          setattr(self, name, serv)
+          self._services[name] = serv
+        else:
+          self._errors[name] = error
+      future.set_result(serv)
+    return serv
+
+  def __getattr__(self, name: str) -> SubService:
+    # only called for services that are not loaded yet
+    if name.startswith('_') or name not in self.__dict__.get('_pending', ()):
+      raise AttributeError(name)
+    serv = self._load(name)
+    if serv is None:
+      raise AttributeError(name) from self._errors.get(name)
+    return serv
+
+  def _fetch(self, url_base: str, model: tuple = None) -> bytes:
+    if self._cache is not None:
+      # with stream set, the body is read in chunks up to the byte cap
+      return self._cache.fetch(
+        url_base, self._configid, 
+        lambda url: fuzz_locate(url, self._pools, model, preload=not self._stream),
+        manager=self._pools, maxbytes=MAX_DOCUMENT_BYTES if self._stream else None
+      )
+    response = fuzz_request(url_base, self._pools, model)
+    if response is not None and response.status == 200:
+      return response.data
     
   def find_service(self, name: str) -> SubService:
     return self[name]
@@ -58,14 +189,14 @@ class Client:
     return self
 
   def __contains__(self, item: str) -> bool:
-    return item in self._services
+    return item in self._services or item in self._pending
 
   def __exit__(self, e_type, e, traceback):
     pass
 
   def __getitem__(self, key) -> SubService:
     if key in self:
-      return self._services[key]
+      return self._load(key)
 
   
   
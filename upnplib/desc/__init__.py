@@ -39,10 +39,17 @@ def typeof(typename: str) -> type:
 
 from .upnpdev import *
 from .scpd import *
+from .stream import (
+  MAX_DOCUMENT_BYTES,
+  MAX_DOCUMENT_ELEMENTS,
+  read_scpd,
+  read_device
+)
 
 __all__ = [
   'xmltype', 'urn', 'urntype', 'typeof',
   'direction', 'StateVariable', 'Argument',
   'Action', 'scpd', 'Icon', 'Service', 
-  'ServiceList', 'device', 'new_device'
+  'ServiceList', 'device', 'parse_device', 'new_device', 'new_devices',
+  'read_scpd', 'read_device', 'MAX_DOCUMENT_BYTES', 'MAX_DOCUMENT_ELEMENTS'
 ]
\ No newline at end of file
@@ -29,6 +29,7 @@ from enum import Enum
 
 from ..utils import  (
   xmltree,
+  _intern,
   _xmlfind,
   _xmlnamespace,
   _xmlfind_attr
@@ -46,15 +47,20 @@ class direction(Enum):
     else: return direction.OUT
 
 class StateVariable:
+  __slots__ = (
+    '_name', '_data_type_name', '_default', '_eventing', '_multicast', 
+    '_allowed_range', '_allowed_values', '_complex_type', '_data_type'
+  )
+
   def __init__(self, name: str = None, data_type: type = None, default=None,
                allowedValues: list = None, eventing: bool = False, 
                allowedValueRange: range = None, multicast: bool = False, 
                root: xmltree.Element = None, nspace: dict = None) -> None:
-    self._name = _xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name
-    self._data_type_name = _xmlfind(root, 'upnp:dataType', namepaces=nspace) if root is not None else data_type
+    self._name = _intern(_xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name)
+    self._data_type_name = _intern(_xmlfind(root, 'upnp:dataType', namepaces=nspace) if root is not None else data_type)
     self._default = _xmlfind(root, 'upnp:defaultValue', namepaces=nspace) if root is not None else default
-    self._eventing = root.get('sendEvents') if root is not None else eventing
-    self._multicast = root.get('multicast', default=False) if root is not None else multicast
+    self._eventing = _intern(root.get('sendEvents')) if root is not None else eventing
+    self._multicast = _intern(root.get('multicast', default=False)) if root is not None else multicast
     self._allowed_range = allowedValueRange
     self._allowed_values = allowedValues if allowedValues else []
     self._complex_type = None
@@ -143,7 +149,7 @@ class StateVariable:
   def _load_allowed_values(self, root: xmltree.Element) -> list:
     values = []
     for value in root.findall('allowedValue'):
-      values.append(value.text)
+      values.append(_intern(value.text))
     return values
   
   def __repr__(self) -> str:
@@ -153,17 +159,19 @@ class StateVariable:
     return self._data_type(*args, **kwds)
 
 class Argument:
+  __slots__ = ('_name', '_arg_direction', '_related_state_variable', 'value')
+
   def __init__(self, name: str = None, arg_direction: direction = direction.IN,
                rst: StateVariable = None, root: xmltree.Element = None,
                nspace: dict = None, value=None) -> None:
-    self._name = _xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name
+    self._name = _intern(_xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name)
     self._arg_direction = (
       _xmlfind(root, 'upnp:direction', namepaces=nspace, extractor=direction.parse_direction) 
       if root is not None 
       else arg_direction
     )
     self._related_state_variable = (
-      _xmlfind(root, 'upnp:relatedStateVariable', namepaces=nspace) 
+      _intern(_xmlfind(root, 'upnp:relatedStateVariable', namepaces=nspace))
       if root is not None 
       else rst
     )
@@ -193,10 +201,12 @@ class Argument:
     )
 
 class Action:
+  __slots__ = ('_name', '_in_arguments', '_out_arguments')
+
   def __init__(self, name: str = None, in_arguments: list = None,
                out_arguments: list = None, root: xmltree.Element = None,
                nspace: dict = None) -> None:
-    self._name = _xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name
+    self._name = _intern(_xmlfind(root, 'upnp:name', namepaces=nspace) if root is not None else name)
     self._in_arguments = in_arguments if in_arguments else []
     self._out_arguments = out_arguments if out_arguments else []
     if root is not None:
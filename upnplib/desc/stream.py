@@ -0,0 +1,135 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Streaming parsers for description and SCPD documents. Documents are parsed 
+incrementally while they are read; every <action>, <stateVariable>, <service>
+and <icon> element is turned into its object and dropped from the tree right 
+away, so memory stays bounded by the caps instead of the document size.
+"""
+from ..utils import xmltree, _xmlnamespace, _xmlrelpath
+
+from .upnpdev import device, _parse_device, _parse_icon, _parse_service
+from .scpd import Action, StateVariable, scpd
+
+# default caps of read_scpd() and read_device()
+MAX_DOCUMENT_BYTES = 4 << 20
+MAX_DOCUMENT_ELEMENTS = 100000
+
+def read_scpd(service, source, maxbytes: int = MAX_DOCUMENT_BYTES, 
+              maxelements: int = MAX_DOCUMENT_ELEMENTS, 
+              chunksize: int = 16384) -> scpd:
+  """Streaming counterpart of scpd(service, xmltree.fromstring(data)).
+
+  source may be bytes, a file-like object such as a urllib3 response 
+  requested with preload_content=False, or an iterable of byte chunks.
+  ValueError is raised as soon as the document exceeds maxbytes bytes or
+  maxelements elements.
+  """
+  result = scpd(service)
+  actions = []
+  for element, parent in _endevents(source, maxbytes, maxelements, chunksize):
+    if parent is None: continue
+    name, parent_name = _xmlrelpath(element), _xmlrelpath(parent)
+    if name == 'stateVariable' and parent_name == 'serviceStateTable':
+      result.setval('vars', StateVariable(root=element, nspace=_xmlnamespace(element, 'upnp')))
+      parent.remove(element)
+    elif name == 'action' and parent_name == 'actionList':
+      actions.append(Action(root=element, nspace=_xmlnamespace(element, 'upnp')))
+      parent.remove(element)
+
+  # the actionList usually precedes the serviceStateTable
+  for action in actions:
+    result._add_action(action)
+  return result
+
+def read_device(host: str, port: int, url: str, source, 
+                maxbytes: int = MAX_DOCUMENT_BYTES, 
+                maxelements: int = MAX_DOCUMENT_ELEMENTS,
+                chunksize: int = 16384) -> device:
+  """Streaming counterpart of parse_device(); see read_scpd() for source and caps."""
+  parsed = {}
+  root = None
+  for element, parent in _endevents(source, maxbytes, maxelements, chunksize):
+    if parent is None:
+      root = element
+      continue
+    name, parent_name = _xmlrelpath(element), _xmlrelpath(parent)
+    if name == 'service' and parent_name == 'serviceList':
+      parsed.setdefault(parent, []).append(_parse_service(element))
+      parent.remove(element)
+    elif name == 'icon' and parent_name == 'iconList':
+      parsed.setdefault(parent, []).append(_parse_icon(element))
+      parent.remove(element)
+  return _parse_device(device(host, port, url), root, parsed)
+
+def _consume(response, reader):
+  # runs reader on a response requested with preload_content=False
+  try:
+    return reader(response)
+  except Exception:
+    # do not put a connection with unread data back into the pool
+    response.close()
+    raise
+  finally:
+    response.release_conn()
+
+def _chunks(source, chunksize: int):
+  if isinstance(source, (bytes, bytearray, memoryview)):
+    view = memoryview(source)
+    for offset in range(0, len(view), chunksize):
+      yield view[offset:offset + chunksize]
+  elif hasattr(source, 'read'):
+    while True:
+      chunk = source.read(chunksize)
+      if not chunk: break
+      yield chunk
+  else:
+    yield from source
+
+def _endevents(source, maxbytes: int, maxelements: int, chunksize: int):
+  # yields (element, parent) for every closed element, parent is None for 
+  # the document element
+  parser = xmltree.XMLPullParser(events=('start', 'end'))
+  size = 0
+  elements = 0
+  stack = []
+
+  def events():
+    nonlocal elements
+    for event, element in parser.read_events():
+      if event == 'start':
+        elements += 1
+        if maxelements is not None and elements > maxelements:
+          raise ValueError('Document has more than %d elements' % maxelements)
+        stack.append(element)
+      else:
+        stack.pop()
+        yield element, (stack[-1] if stack else None)
+
+  for chunk in _chunks(source, chunksize):
+    size += len(chunk)
+    if maxbytes is not None and size > maxbytes:
+      raise ValueError('Document is larger than %d bytes' % maxbytes)
+    parser.feed(chunk)
+    yield from events()
+  parser.close()
+  yield from events()
@@ -19,12 +19,17 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import concurrent.futures
+import functools
 import urllib3
 
 from typing import Iterator
 from . import urn
 
+from ..cache import shared_cache
+from ..pool import shared_pools
 from ..utils import (
+  _intern,
   _xmlfind, 
   _xmlrelpath,
   _xmlnamespace, 
@@ -41,11 +46,13 @@ class XmlReader:
     pass
 
 class Icon:
+  __slots__ = ('_mime', '_width', '_height', '_depth', '_url')
+
   def __init__(self, mimetype: str = None, width: int = 0, height: int = 0,
                depth: int = 0, url: str = None, root: xmltree.Element = None
               ) -> None:
     nspace = _xmlnamespace(root, 'upnp')
-    self._mime = _xmlfind(root, 'upnp:mimetype', namepaces=nspace) if root is not None else mimetype
+    self._mime = _intern(_xmlfind(root, 'upnp:mimetype', namepaces=nspace) if root is not None else mimetype)
     self._width = int(_xmlfind(root, 'upnp:width', default='0', namepaces=nspace)) if root is not None else width
     self._height = int(_xmlfind(root, 'upnp:height', default='0', namepaces=nspace)) if root is not None else height
     self._depth = int(_xmlfind(root, 'upnp:depth', default='0', namepaces=nspace)) if root is not None else depth
@@ -77,12 +84,17 @@ class Icon:
     )
 
 class Service:
+  __slots__ = ('_service_type', '_sid', '_scpd_url', '_control_url', '_event_url', '_url_base')
+
   def __init__(self, s_type: str = None, sid: str = None, scpd_url: str = None,
                control_url: str = None, event_url: str = None, url_base: str = None,
                root: xmltree.Element = None) -> None:
     nspace = _xmlnamespace(root, 'upnp')
     self._service_type = urn(_xmlfind(root, 'upnp:serviceType', namepaces=nspace)) if root is not None else s_type
-    self._sid = urn(_xmlfind(root, 'upnp:serviceId', namepaces=nspace) if root is not None else sid)
+    if root is None and isinstance(sid, urn):
+      self._sid = sid
+    else:
+      self._sid = urn(_xmlfind(root, 'upnp:serviceId', namepaces=nspace) if root is not None else sid)
     self._scpd_url = _xmlfind(root, 'upnp:SCPDURL', namepaces=nspace) if root is not None else scpd_url
     self._control_url = _xmlfind(root, 'upnp:controlURL', namepaces=nspace) if root is not None else control_url
     self._event_url = _xmlfind(root, 'upnp:eventSubURL', namepaces=nspace) if root is not None else event_url
@@ -221,11 +233,153 @@ class device(XmlReader):
   def __iter__(self) -> Iterator[str]:
     return iter(self._attrib)
 
-def new_device(url: str, proxy: urllib3.ProxyManager = None) -> device:
-  manager = proxy if proxy else urllib3.PoolManager(headers={'User-Agent': 'upnplib/1.1'})
+# field tags of <service> and <icon> elements, resolved once per namespace
+@functools.lru_cache(maxsize=16)
+def _fieldtags(prefix: str) -> tuple:
+  service = {
+    prefix + 'serviceType': 0, prefix + 'serviceId': 1, prefix + 'SCPDURL': 2,
+    prefix + 'controlURL': 3, prefix + 'eventSubURL': 4, prefix + 'URLBase': 5
+  }
+  icon = {
+    prefix + 'mimetype': 0, prefix + 'width': 1, prefix + 'height': 2,
+    prefix + 'depth': 3, prefix + 'url': 4
+  }
+  return service, icon
+
+def _prefix(tag: str) -> str:
+  # '{namespace}' of a tag, or '' without namespace
+  return tag[:tag.find('}') + 1]
+
+def _fields(element: xmltree.Element, tags: dict, count: int) -> list:
+  values = [None] * count
+  for child in element:
+    index = tags.get(child.tag)
+    if index is not None and values[index] is None:
+      values[index] = child.text
+  return values
+
+# urn objects are immutable, devices of the same kind share them
+_shared_urn = functools.lru_cache(maxsize=4096)(urn)
+
+def _parse_service(element: xmltree.Element) -> Service:
+  s_type, sid, scpd_url, control_url, event_url, url_base = _fields(
+    element, _fieldtags(_prefix(element.tag))[0], 6
+  )
+  return Service(_shared_urn(s_type), _shared_urn(sid), scpd_url, control_url, 
+                 event_url, url_base)
+
+def _parse_icon(element: xmltree.Element) -> Icon:
+  mimetype, width, height, depth, url = _fields(
+    element, _fieldtags(_prefix(element.tag))[1], 5
+  )
+  return Icon(mimetype, int(width or 0), int(height or 0), int(depth or 0), url)
+
+def _parse_device(dev: device, element: xmltree.Element, parsed: dict = None) -> device:
+  # parsed: icons and services already built by read_device() per list element
+  for child in element:
+    tag = child.tag
+    name = tag[tag.find('}') + 1:]
+    if name == 'device':
+      _parse_device(dev, child, parsed)
+    elif name == 'iconList':
+      if parsed: dev._icons.extend(parsed.get(child, ()))
+      dev._icons.extend(_parse_icon(x) for x in child)
+    elif name == 'serviceList':
+      services = dev._services = ServiceList()
+      for x in parsed.get(child, ()) if parsed else ():
+        services.append(x)
+      for x in child:
+        services.append(_parse_service(x))
+    elif name == 'deviceList':
+      for node in child:
+        dev._embed_devices.append(
+          _parse_device(device(dev.host, dev.port, dev.url), node, parsed)
+        )
+    else:
+      # UDN, serialNumber etc. are unique per device, only the type is shared
+      value = child.text
+      dev._attrib[_intern(name)] = _intern(value) if name == 'deviceType' else value
+  return dev
+
+def parse_device(host: str, port: int, url: str, root: xmltree.Element) -> device:
+  """Builds the device of a description document in a single pass.
+
+  The result equals device(host, port, url, root=root), but every element 
+  is visited once and the namespaced field tags are resolved up front 
+  instead of one find() per field.
+  """
+  return _parse_device(device(host, port, url), root)
+
+def new_device(url: str, proxy: urllib3.ProxyManager = None, 
+               timeout: float = None, cache = None, configid: str = None,
+               stream: bool = False) -> device:
+  """Fetches and parses the description located at url.
+
+  With stream set, the description is parsed while it is received and the
+  size caps of upnplib.desc.stream apply.
+  """
+  from .stream import MAX_DOCUMENT_BYTES, read_device, _consume
+
+  manager = proxy if proxy else shared_pools()
+  cache = cache if cache is not None else shared_cache()
+  # an explicit timeout=None would disable the timeout of the pools
+  kwds = {'timeout': timeout} if timeout is not None else {}
   try:
-    response = manager.request('GET', url)
     host, port = url[7:].split('/')[0].split(':')
-    return device(host, int(port), url, root=xmltree.fromstring(str(response.data, 'utf-8')))
+    if cache is not None:
+      # doccache: no request at all if the configid is unchanged
+      data = cache.fetch(url, configid, timeout=timeout, manager=manager, 
+                         maxbytes=MAX_DOCUMENT_BYTES if stream else None)
+      if data is None:
+        raise ConnectionError('Could not fetch %s' % url)
+    elif stream:
+      response = manager.request('GET', url, preload_content=False, **kwds)
+      return _consume(response, lambda body: read_device(host, int(port), url, body))
+    else:
+      data = manager.request('GET', url, **kwds).data
+
+    if stream:
+      return read_device(host, int(port), url, data)
+    return parse_device(host, int(port), url, xmltree.fromstring(str(data, 'utf-8')))
   except Exception as e:
     raise InterruptedError from e
+
+def new_devices(locations, workers: int = 16, proxy: urllib3.PoolManager = None,
+                timeout: float = 5, cache = None, 
+                stream: bool = False) -> Iterator[tuple]: # Iterator[tuple[str, device | Exception]]
+  """Fetches and parses the descriptions of all given locations concurrently.
+
+  At most workers descriptions are fetched at the same time through the 
+  shared connection pools (or the given proxy). (location, device) tuples 
+  are yielded as soon as a fetch has finished, or (location, error) if 
+  new_device() failed for it. Duplicate locations are fetched only once.
+
+  Locations may also be given as (location, configid) tuples, which lets a 
+  doccache skip the request for unchanged devices.
+  """
+  manager = proxy if proxy else shared_pools()
+  seen = set()
+  pending = {}
+  locations = iter(locations)
+  with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+    while True:
+      # keep the amount of queued fetches bounded for large inputs
+      for location in locations:
+        configid = None
+        if isinstance(location, tuple):
+          location, configid = location
+        if location in seen: continue
+        seen.add(location)
+        future = executor.submit(new_device, location, manager, timeout, cache, configid, stream)
+        pending[future] = location
+        if len(pending) >= workers * 2: break
+      if not pending:
+        return
+
+      done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+      for future in done:
+        location = pending.pop(future)
+        try:
+          yield location, future.result()
+        except InterruptedError as error:
+          yield location, error
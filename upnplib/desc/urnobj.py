@@ -22,6 +22,8 @@
 
 from enum import Enum
 
+from ..utils import _intern
+
 class urntype(Enum):
   DEVICE = 'device'
   SERVICE = 'service'
@@ -46,6 +48,8 @@ class urn:
   in the Vendor Domain Name shall be replaced with hyphens in accordance with RFC 2141. 
   The highest supported version of the device type shall be specified.
   """
+  __slots__ = ('_domain', '_urn_type', '_device_type', '_ver', '_value')
+
   def __init__(self, value: str) -> None:
     self._domain = None
     self._urn_type = None
@@ -54,10 +58,12 @@ class urn:
 
     if value is not None:
       values = value.split(':')
+      values = [_intern(x) for x in values]
       if len(values) == 5:
         _, self._domain, self._urn_type, self._device_type, self._ver = values
       elif len(values) == 4:
         _, self._domain, self._urn_type, self._device_type = values
+      value = _intern(value)
     self._value = value
     
     # load URN type if possible
@@ -0,0 +1,191 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Process-wide registry of HTTP connection pools. Descriptions, SCPD documents 
+and control requests to the same device share one keep-alive pool per 
+(host, port) instead of opening a new pool manager for every action.
+"""
+import collections
+import threading
+import urllib3
+
+__all__ = [
+  'poolstats', 'httppools', 'shared_pools', 'set_shared_pools'
+]
+
+USER_AGENT = 'upnplib/1.1'
+
+class poolstats:
+  """Counters of a httppools registry."""
+  def __init__(self) -> None:
+    self.hits = 0
+    self.misses = 0
+    self.evicted = 0
+    self.requests = 0
+    self.connections = 0
+
+  @property
+  def hitrate(self) -> float:
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
+
+  def __repr__(self) -> str:
+    return '<poolstats hits=%d, misses=%d, evicted=%d, requests=%d, connections=%d>' % (
+      self.hits, self.misses, self.evicted, self.requests, self.connections
+    )
+
+class httppools:
+  """Registry of HTTP connection pools keyed by (host, port).
+
+  Each pool keeps up to maxsize idle keep-alive connections to one host; if 
+  block is set, no more than maxsize connections are opened at the same time
+  and further requests wait for a free one. At most maxpools pools are kept, 
+  the least recently used one is closed when another host is contacted.
+
+  The registry can be used wherever a urllib3.PoolManager was used before:
+
+  >>> pools = httppools(maxsize=2)
+  >>> response = pools.request('GET', 'http://192.168.0.2:49152/desc.xml')
+  >>> pools.stats
+  <poolstats hits=0, misses=1, evicted=0, requests=1, connections=1>
+  """
+  def __init__(self, maxsize: int = 4, maxpools: int = 256, block: bool = False,
+               keepalive: bool = True, timeout: float = None, retries = None,
+               headers: dict = None) -> None:
+    self._maxsize = maxsize
+    self._maxpools = maxpools
+    self._block = block
+    self._timeout = timeout if timeout is not None else urllib3.Timeout.DEFAULT_TIMEOUT
+    self._retries = retries
+    # case-insensitive, so that given headers replace the defaults
+    self._headers = urllib3.HTTPHeaderDict({'User-Agent': USER_AGENT})
+    self._headers['Connection'] = 'keep-alive' if keepalive else 'close'
+    if headers:
+      self._headers.update(headers)
+
+    self._pools = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._stats = poolstats()
+    # counters of pools that were already closed
+    self._closed_requests = 0
+    self._closed_connections = 0
+
+  @property
+  def stats(self) -> poolstats:
+    # connection and request counters are summed up from the open pools
+    with self._lock:
+      pools = list(self._pools.values())
+    self._stats.requests = self._closed_requests + sum(p.num_requests for p in pools)
+    self._stats.connections = self._closed_connections + sum(p.num_connections for p in pools)
+    return self._stats
+
+  @property
+  def maxsize(self) -> int:
+    return self._maxsize
+
+  def pool(self, host: str, port: int = 80, scheme: str = 'http') -> urllib3.HTTPConnectionPool:
+    """Returns the pool for the given host and port, creating it if needed."""
+    key = (host, port)
+    with self._lock:
+      pool = self._pools.get(key)
+      if pool is not None:
+        self._pools.move_to_end(key)
+        self._stats.hits += 1
+        return pool
+
+      self._stats.misses += 1
+      cls = urllib3.HTTPSConnectionPool if scheme == 'https' else urllib3.HTTPConnectionPool
+      pool = cls(host, port, maxsize=self._maxsize, block=self._block, 
+                 timeout=self._timeout, retries=self._retries, headers=self._headers)
+      self._pools[key] = pool
+      while self._maxpools and len(self._pools) > self._maxpools:
+        _, old = self._pools.popitem(last=False)
+        self._stats.evicted += 1
+        self._retire(old)
+      return pool
+
+  def _retire(self, pool: urllib3.HTTPConnectionPool) -> None:
+    self._closed_requests += pool.num_requests
+    self._closed_connections += pool.num_connections
+    pool.close()
+
+  def request(self, method: str, url: str, headers: dict = None, 
+              **kwds) -> urllib3.HTTPResponse:
+    """Sends a request through the pool of the url's host.
+
+    The given headers are added to the default headers of this registry
+    (replacing defaults of the same name in any case),
+    all other keywords are passed to urllib3's request().
+    """
+    parsed = urllib3.util.parse_url(url)
+    scheme = parsed.scheme or 'http'
+    port = parsed.port or (443 if scheme == 'https' else 80)
+    pool = self.pool(parsed.host, port, scheme)
+    if headers:
+      merged = urllib3.HTTPHeaderDict(self._headers)
+      for name, value in headers.items():
+        merged[name] = value
+      headers = merged
+    else:
+      headers = self._headers
+    return pool.request(method, parsed.request_uri, headers=headers, **kwds)
+
+  def clear(self) -> None:
+    """Closes all pools and their idle connections."""
+    with self._lock:
+      while self._pools:
+        _, pool = self._pools.popitem(last=False)
+        self._retire(pool)
+
+  def __len__(self) -> int:
+    return len(self._pools)
+
+  def __contains__(self, key: tuple) -> bool:
+    return key in self._pools
+
+  def __enter__(self) -> 'httppools':
+    return self
+
+  def __exit__(self, e_type, e, traceback):
+    self.clear()
+
+  def __repr__(self) -> str:
+    return '<httppools pools=%d, maxsize=%d>' % (len(self), self._maxsize)
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_pools() -> httppools:
+  """Returns the process-wide registry, created with default settings on first use."""
+  global _shared
+  if _shared is None:
+    with _shared_lock:
+      if _shared is None:
+        _shared = httppools()
+  return _shared
+
+def set_shared_pools(pools: httppools) -> httppools:
+  """Replaces the process-wide registry (e.g. to change maxsize) and returns the old one."""
+  global _shared
+  with _shared_lock:
+    old, _shared = _shared, pools
+  return old
@@ -0,0 +1,181 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import uuid
+
+from xml.sax.saxutils import escape
+
+UPNP_DEVICE_NS = 'urn:schemas-upnp-org:device-1-0'
+UPNP_SERVICE_NS = 'urn:schemas-upnp-org:service-1-0'
+
+class simaction:
+  """An action of a simulated service.
+
+  Arguments are given as lists of names; each argument gets its own state 
+  variable of type string. Out arguments are answered with the values of 
+  the given response dict (or an empty string).
+  """
+  def __init__(self, name: str, in_args: list = None, out_args: list = None,
+               response: dict = None) -> None:
+    self.name = name
+    self.in_args = in_args or []
+    self.out_args = out_args or []
+    self.response = response or {}
+
+class simservice:
+  """A simulated service with generated or recorded SCPD document."""
+  def __init__(self, service_type: str, actions: list = None, 
+               scpd: bytes = None) -> None:
+    self.service_type = service_type
+    self.name = service_type.split(':')[-2]
+    self.actions = {}
+    for action in actions or []:
+      self.actions[action.name] = action
+    self._scpd = scpd
+
+  @property
+  def service_id(self) -> str:
+    return 'urn:upnp-org:serviceId:%s' % self.name
+
+  @property
+  def scpd_url(self) -> str:
+    return '/scpd/%s.xml' % self.name
+
+  @property
+  def control_url(self) -> str:
+    return '/control/%s' % self.name
+
+  @property
+  def event_url(self) -> str:
+    return '/event/%s' % self.name
+
+  def scpd(self) -> bytes:
+    if self._scpd is None:
+      self._scpd = self._generate().encode('utf-8')
+    return self._scpd
+
+  def _generate(self) -> str:
+    variables = []
+    actions = []
+    for action in self.actions.values():
+      arguments = []
+      for direction, names in (('in', action.in_args), ('out', action.out_args)):
+        for name in names:
+          variable = 'A_ARG_TYPE_%s' % name
+          if variable not in variables:
+            variables.append(variable)
+          arguments.append(
+            '<argument><name>%s</name><direction>%s</direction>'
+            '<relatedStateVariable>%s</relatedStateVariable></argument>' % (
+              name, direction, variable
+          ))
+      actions.append('<action><name>%s</name><argumentList>%s</argumentList></action>' % (
+        action.name, ''.join(arguments)
+      ))
+    state_vars = [
+      '<stateVariable sendEvents="no"><name>%s</name><dataType>string</dataType></stateVariable>' % x
+      for x in variables
+    ]
+    return (
+      '<?xml version="1.0"?><scpd xmlns="%s"><specVersion><major>1</major><minor>0</minor></specVersion>'
+      '<actionList>%s</actionList><serviceStateTable>%s</serviceStateTable></scpd>' % (
+        UPNP_SERVICE_NS, ''.join(actions), ''.join(state_vars)
+    ))
+
+def default_services() -> list:
+  return [
+    simservice('urn:schemas-upnp-org:service:SimCounter:1', [
+      simaction('GetValue', out_args=['Value'], response={'Value': '42'}),
+      simaction('SetValue', in_args=['NewValue'])
+    ]),
+    simservice('urn:schemas-upnp-org:service:SimInfo:1', [
+      simaction('GetInfo', out_args=['Name', 'Version'], 
+                response={'Name': 'upnplib-sim', 'Version': '1'})
+    ])
+  ]
+
+class simdevice:
+  """A simulated root device reachable on its own loopback address.
+
+  The description is generated from the given services unless a recorded 
+  description document is given. Recorded SCPD documents are served by the 
+  services themselves (simservice(scpd=...)).
+  """
+  def __init__(self, host: str, http_port: int, services: list = None,
+               device_type: str = 'urn:schemas-upnp-org:device:SimDevice:1',
+               friendly_name: str = None, udn: str = None,
+               description: bytes = None) -> None:
+    self.host = host
+    self.http_port = http_port
+    self.services = services if services is not None else default_services()
+    self.device_type = device_type
+    self.friendly_name = friendly_name or 'Simulated device %s' % host
+    self.udn = udn or 'uuid:%s' % uuid.uuid5(uuid.NAMESPACE_URL, host)
+    self._description = description
+    self._scpds = {}
+    self._services = {}
+    for service in self.services:
+      self._scpds[service.scpd_url] = service
+      self._services[service.control_url] = service
+
+  @property
+  def location(self) -> str:
+    return 'http://%s:%d/desc.xml' % (self.host, self.http_port)
+
+  def targets(self) -> list:
+    """All search targets this device answers to (root, UDN, types)."""
+    targets = ['upnp:rootdevice', self.udn, self.device_type]
+    for service in self.services:
+      if service.service_type not in targets:
+        targets.append(service.service_type)
+    return targets
+
+  def usn(self, target: str) -> str:
+    if target == self.udn: return self.udn
+    return '%s::%s' % (self.udn, target)
+
+  def description(self) -> bytes:
+    if self._description is None:
+      self._description = self._generate().encode('utf-8')
+    return self._description
+
+  def scpd(self, path: str) -> bytes:
+    service = self._scpds.get(path)
+    return service.scpd() if service is not None else None
+
+  def service(self, control_url: str) -> simservice:
+    return self._services.get(control_url)
+
+  def _generate(self) -> str:
+    services = ''.join(
+      '<service><serviceType>%s</serviceType><serviceId>%s</serviceId>'
+      '<SCPDURL>%s</SCPDURL><controlURL>%s</controlURL><eventSubURL>%s</eventSubURL>'
+      '</service>' % (
+        x.service_type, x.service_id, x.scpd_url, x.control_url, x.event_url
+      ) for x in self.services
+    )
+    return (
+      '<?xml version="1.0"?><root xmlns="%s"><specVersion><major>1</major><minor>0</minor></specVersion>'
+      '<device><deviceType>%s</deviceType><friendlyName>%s</friendlyName>'
+      '<manufacturer>upnplib</manufacturer><modelName>sim</modelName><UDN>%s</UDN>'
+      '<serviceList>%s</serviceList></device></root>' % (
+        UPNP_DEVICE_NS, self.device_type, escape(self.friendly_name), self.udn, services
+    ))
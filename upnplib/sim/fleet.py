@@ -0,0 +1,341 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import hashlib
+import heapq
+import http.server
+import ipaddress
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+import xml.etree.ElementTree as xmltree
+
+from ..ssdp import SSDP_MULTICAST, SSDP_PORT, Message
+from .documents import simdevice
+
+# not exported by the socket module on all platforms (linux value)
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+SOAP_ENCODING = 'http://schemas.xmlsoap.org/soap/encoding/'
+
+class simstats:
+  """Counters of a simfleet."""
+  def __init__(self) -> None:
+    self.searches = 0
+    self.responses = 0
+    self.requests = 0
+    self.calls = 0
+    self.faults = 0
+    self._lock = threading.Lock()
+
+  def add(self, name: str, amount: int = 1):
+    with self._lock:
+      setattr(self, name, getattr(self, name) + amount)
+
+  def __repr__(self) -> str:
+    return '<simstats searches=%d, responses=%d, requests=%d, calls=%d, faults=%d>' % (
+      self.searches, self.responses, self.requests, self.calls, self.faults
+    )
+
+class _ssdpresponder:
+  """Answers searches for all devices of a fleet from one socket.
+
+  The destination address of a search selects the device (unicast) or all 
+  devices (multicast); responses are sent with the device address as source
+  (IP_PKTINFO) after a random delay of up to min(MX, jitter) seconds.
+  """
+  def __init__(self, fleet: 'simfleet', port: int) -> None:
+    self._fleet = fleet
+    self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+    self._sock.bind(('0.0.0.0', port))
+    try:
+      mreq = socket.inet_aton(SSDP_MULTICAST) + socket.inet_aton('127.0.0.1')
+      self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    except OSError:
+      # loopback without multicast support, unicast searches still work
+      pass
+    self._sock.setblocking(False)
+    self._pending = []
+    self._stopped = threading.Event()
+
+  @property
+  def port(self) -> int:
+    return self._sock.getsockname()[1]
+
+  def _responses(self, device: simdevice, st: str) -> list:
+    if st == 'ssdp:all':
+      targets = device.targets()
+    elif st in device.targets():
+      targets = [st]
+    else:
+      return []
+    return [(
+      'HTTP/1.1 200 OK\r\nCACHE-CONTROL: max-age=1800\r\nEXT:\r\n'
+      'LOCATION: %s\r\nSERVER: Linux/5.0 UPnP/1.1 upnplib-sim/1.0\r\n'
+      'ST: %s\r\nUSN: %s\r\nBOOTID.UPNP.ORG: 1\r\nCONFIGID.UPNP.ORG: 1\r\n\r\n' % (
+        device.location, target, device.usn(target)
+      )).encode('utf-8') for target in targets
+    ]
+
+  def _handle(self, data: bytes, destination: str, address: tuple):
+    try:
+      message = Message(raw_data=data)
+    except ValueError:
+      return
+    if 'ST' not in message or message['MAN'] is None:
+      return
+    self._fleet.stats.add('searches')
+
+    if destination == SSDP_MULTICAST:
+      devices = self._fleet.devices
+      try:
+        mx = int(message['MX'].value) if 'MX' in message else 1
+      except ValueError:
+        mx = 1
+      delay = min(mx, self._fleet.mx_jitter)
+    else:
+      device = self._fleet.device(destination)
+      devices = [device] if device is not None else []
+      delay = 0
+
+    now = time.monotonic()
+    for device in devices:
+      due = now + self._fleet.random.uniform(0, delay)
+      for payload in self._responses(device, message['ST'].value):
+        heapq.heappush(self._pending, (due, id(payload), payload, device.host, address))
+
+  def _send_due(self) -> float:
+    now = time.monotonic()
+    while self._pending and self._pending[0][0] <= now:
+      _, _, payload, source, address = heapq.heappop(self._pending)
+      pktinfo = struct.pack('I4s4s', 0, socket.inet_aton(source), b'\0' * 4)
+      try:
+        self._sock.sendmsg([payload], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, address)
+      except OSError:
+        continue
+      self._fleet.stats.add('responses')
+    if self._pending:
+      return self._pending[0][0] - now
+
+  def run(self):
+    with selectors.DefaultSelector() as selector:
+      selector.register(self._sock, selectors.EVENT_READ)
+      while not self._stopped.is_set():
+        pending = self._send_due()
+        timeout = 0.1 if pending is None else min(0.1, pending)
+        if not selector.select(timeout):
+          continue
+        while True:
+          try:
+            data, ancdata, _, address = self._sock.recvmsg(8192, socket.CMSG_SPACE(12))
+          except (BlockingIOError, InterruptedError):
+            break
+          destination = None
+          for level, kind, value in ancdata:
+            if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+              destination = socket.inet_ntoa(value[8:12])
+          self._handle(data, destination, address)
+
+  def stop(self):
+    self._stopped.set()
+
+  def close(self):
+    self._sock.close()
+
+class _simhandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+  server_version = 'upnplib-sim/1.0'
+
+  def log_message(self, format, *args):
+    pass
+
+  def _reply(self, status: int, body: bytes, content_type: str = 'text/xml; charset="utf-8"',
+             etag: str = None):
+    self.send_response(status)
+    self.send_header('Content-Type', content_type)
+    if etag:
+      self.send_header('ETag', etag)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _device(self) -> simdevice:
+    fleet = self.server.fleet
+    fleet.stats.add('requests')
+    return fleet.device(self.connection.getsockname()[0])
+
+  def do_GET(self):
+    device = self._device()
+    if device is None:
+      return self._reply(404, b'')
+    if self.path == '/desc.xml':
+      document = device.description()
+    else:
+      document = device.scpd(self.path)
+    if document is None:
+      return self._reply(404, b'')
+
+    etag = '"%s"' % hashlib.sha1(document).hexdigest()[:16]
+    if self.headers.get('If-None-Match') == etag:
+      return self._reply(304, b'', etag=etag)
+    self._reply(200, document, etag=etag)
+
+  def do_POST(self):
+    device = self._device()
+    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+    service = device.service(self.path) if device is not None else None
+    if service is None:
+      return self._reply(404, b'')
+
+    fleet = self.server.fleet
+    fleet.stats.add('calls')
+    if fleet.latency:
+      time.sleep(fleet.random.uniform(0, fleet.latency) if fleet.latency_jitter else fleet.latency)
+
+    action_name = self.headers.get('SOAPACTION', '').strip('"').split('#')[-1]
+    if not action_name:
+      try:
+        action_name = xmltree.fromstring(body)[0][0].tag.split('}')[-1]
+      except (xmltree.ParseError, IndexError):
+        action_name = ''
+    action = service.actions.get(action_name)
+
+    if action is None:
+      return self._fault(401, 'Invalid Action')
+    if fleet.fault_rate and fleet.random.random() < fleet.fault_rate:
+      return self._fault(501, 'Action Failed')
+
+    arguments = ''.join(
+      '<%s>%s</%s>' % (name, action.response.get(name, ''), name) 
+      for name in action.out_args
+    )
+    self._reply(200, self._envelope(
+      '<u:%sResponse xmlns:u="%s">%s</u:%sResponse>' % (
+        action.name, service.service_type, arguments, action.name
+    )))
+
+  def _fault(self, code: int, description: str):
+    self.server.fleet.stats.add('faults')
+    self._reply(500, self._envelope(
+      '<s:Fault><faultcode>s:Client</faultcode><faultstring>UPnPError</faultstring>'
+      '<detail><UPnPError xmlns="urn:schemas-upnp-org:control-1-0"><errorCode>%d</errorCode>'
+      '<errorDescription>%s</errorDescription></UPnPError></detail></s:Fault>' % (code, description)
+    ))
+
+  def _envelope(self, body: str) -> bytes:
+    return (
+      '<?xml version="1.0"?><s:Envelope xmlns:s="%s" s:encodingStyle="%s">'
+      '<s:Body>%s</s:Body></s:Envelope>' % (SOAP_NS, SOAP_ENCODING, body)
+    ).encode('utf-8')
+
+class simfleet:
+  """Runs count simulated devices on consecutive loopback addresses.
+
+  Searches are answered on ssdp_port (multicast and unicast), documents and 
+  control calls are served on http_port of every device address. Control 
+  calls are delayed by latency seconds (uniformly distributed if 
+  latency_jitter is set) and fail with a UPnP fault at the given rate. 
+  Recorded documents can be used by passing devices built with 
+  simdevice(description=...) and simservice(scpd=...):
+
+  >>> with simfleet(100, ssdp_port=19000) as fleet:
+  ...   result = ssdp_sweep(['127.0.0.0/24'], port=19000)
+  """
+  def __init__(self, count: int = 10, first: str = '127.0.0.2', 
+               http_port: int = 8080, ssdp_port: int = SSDP_PORT,
+               mx_jitter: float = 1.0, latency: float = 0.0, 
+               latency_jitter: bool = False, fault_rate: float = 0.0,
+               services = None, devices: list = None, seed: int = None) -> None:
+    self.mx_jitter = mx_jitter
+    self.latency = latency
+    self.latency_jitter = latency_jitter
+    self.fault_rate = fault_rate
+    self.random = random.Random(seed)
+    self.stats = simstats()
+    self._http_port = http_port
+    self._ssdp_port = ssdp_port
+
+    if devices is None:
+      devices = []
+      start = ipaddress.ip_address(first)
+      for index in range(count):
+        # services may be a factory, so that devices do not share them
+        device_services = services() if callable(services) else services
+        devices.append(simdevice(str(start + index), http_port, device_services))
+    self.devices = devices
+    self._by_host = {}
+    for device in devices:
+      self._by_host[device.host] = device
+
+    self._responder = None
+    self._server = None
+    self._threads = []
+
+  def device(self, host: str) -> simdevice:
+    return self._by_host.get(host)
+
+  @property
+  def locations(self) -> list:
+    return [device.location for device in self.devices]
+
+  @property
+  def ssdp_port(self) -> int:
+    return self._responder.port if self._responder else self._ssdp_port
+
+  def start(self):
+    self._responder = _ssdpresponder(self, self._ssdp_port)
+    self._server = http.server.ThreadingHTTPServer(('0.0.0.0', self._http_port), _simhandler)
+    self._server.daemon_threads = True
+    self._server.fleet = self
+    self._threads = [
+      threading.Thread(target=self._responder.run, daemon=True),
+      threading.Thread(target=self._server.serve_forever, daemon=True)
+    ]
+    for thread in self._threads:
+      thread.start()
+
+  def stop(self):
+    if self._responder is not None:
+      self._responder.stop()
+    if self._server is not None:
+      self._server.shutdown()
+    for thread in self._threads:
+      thread.join()
+    if self._responder is not None:
+      self._responder.close()
+      self._responder = None
+    if self._server is not None:
+      self._server.server_close()
+      self._server = None
+    self._threads = []
+
+  def __enter__(self) -> 'simfleet':
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
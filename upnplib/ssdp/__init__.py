@@ -25,6 +25,7 @@ broadcast.
 """
 
 SSDP_MULTICAST = '239.255.255.250'
+SSDP_MULTICAST_V6 = 'ff02::c'
 SSDP_PORT = 1900
 
 from .message import (
@@ -32,7 +33,23 @@ from .message import (
   man,
   Field,
   Message,
-  build_msearch
+  ssdpcache,
+  msearchtemplate,
+
+  parse_message,
+  build_msearch,
+  msearch_template
+)
+
+from .window import (
+  stopreason,
+  ssdpwindow,
+  ssdpschedule
+)
+
+from .receiver import (
+  ssdpstats,
+  ssdpreceiver
 )
 
 from .agent import (
@@ -40,5 +57,50 @@ from .agent import (
   ssdphost,
   ssdpresult,
 
-  ssdp_discover
+  parse_usn,
+  ssdp_discover,
+  ssdp_stream,
+  ssdp_search
+)
+
+from .multi import (
+  local_interfaces,
+  local_interfaces6,
+  ssdpmultiagent,
+
+  ssdp_discover_all
+)
+
+from .sweep import (
+  tokenbucket,
+  sweepstats,
+  ssdpsweep,
+
+  ssdp_sweep
+)
+
+from .capture import (
+  ssdprecorder,
+  replaystats,
+
+  read_capture,
+  read_pcap,
+  read_records,
+  replay
+)
+
+from .listener import (
+  ssdpevent,
+  ssdpentry,
+  ssdptable,
+  ssdplistener,
+
+  max_age
+)
+
+from .aio import (
+  ssdpprotocol,
+  aiossdpagent,
+
+  ssdp_discover_async
 )
\ No newline at end of file
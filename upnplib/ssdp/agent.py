@@ -20,36 +20,88 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import heapq
 import socket
 import struct
+import time
 
 from typing import Iterator, overload
 from . import (
   SSDP_MULTICAST,
+  SSDP_MULTICAST_V6,
   SSDP_PORT,
 
   Message,
-  build_msearch
-)
+  ssdpcache,
+  msearchtemplate,
 
-class ssdpagent:
-  def __init__(self, ttl: int = 2, address: str = None, iface: str = None) -> None:
-    self._error__handlers = []
-    self._iter_amount = -1
+  msearch_template
+)
+from .window import ssdpwindow, ssdpschedule, _receiveloop
 
-    self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    self._sock.settimeout(5)
+def _scope(scope_id) -> int:
+  if isinstance(scope_id, str):
+    return socket.if_nametoindex(scope_id)
+  return scope_id or 0
 
-    ttl = struct.pack('b', ttl)
-    self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
-    self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+def _ssdpsocket(ttl: int = 2, address: str = None, iface: str = None,
+                family: int = socket.AF_INET, scope_id: int = 0) -> socket.socket:
+  sock = socket.socket(family, socket.SOCK_DGRAM)
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
-    self._address = (SSDP_MULTICAST, SSDP_PORT)
+  if family == socket.AF_INET6:
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, ttl)
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_LOOP, 1)
+    if scope_id:
+      sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, scope_id)
     if address is not None:
-      self._sock.bind((address, 0))
-    if iface is not None:
-      self._sock.setsockopt(socket.SOL_SOCKET, getattr(socket, "SO_BINDTODEVICE", 25), iface)
+      sock.bind((address, 0, 0, scope_id))
+  else:
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack('b', ttl))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    if address is not None:
+      sock.bind((address, 0))
+  if iface is not None:
+    if isinstance(iface, str):
+      iface = iface.encode('utf-8')
+    sock.setsockopt(socket.SOL_SOCKET, getattr(socket, "SO_BINDTODEVICE", 25), iface)
+  return sock
+
+class ssdpagent(_receiveloop):
+  """Sends searches to the SSDP multicast group and receives the responses.
+
+  For IPv6 (family=AF_INET6) searches are sent to the link-local group 
+  ff02::c on the interface given by scope_id (index or name); hosts are then
+  reported with their scope, e.g. 'fe80::1%eth0'. Received datagrams are 
+  passed to the optional recorder callable as (data, address), e.g. an 
+  ssdprecorder.
+  """
+  def __init__(self, ttl: int = 2, address: str = None, iface: str = None,
+               window: ssdpwindow = None, bufsize: int = 8192,
+               cache: ssdpcache = None, family: int = socket.AF_INET,
+               scope_id = None, recorder = None) -> None:
+    self._error__handlers = []
+    self._recorder = recorder
+    self._cache = cache
+    self._bufsize = bufsize
+    self._iter_amount = -1
+    self._window = window
+    self._reason = None
+    self._malformed = 0
+
+    self._family = family
+    self._timeout = 5
+    if family == socket.AF_INET6:
+      scope_id = _scope(scope_id)
+      self._sock = _ssdpsocket(ttl, address, iface, family, scope_id)
+      self._address = (SSDP_MULTICAST_V6, SSDP_PORT, 0, scope_id)
+      self._host = '[%s]' % SSDP_MULTICAST_V6
+    else:
+      self._sock = _ssdpsocket(ttl, address, iface)
+      self._address = (SSDP_MULTICAST, SSDP_PORT)
+      self._host = SSDP_MULTICAST
+    self._sock.settimeout(self._timeout)
+    self._pending = []
   
   def add_error_handler(self, handler):
     if handler: self._error__handlers.append(handler)
@@ -57,30 +109,87 @@ class ssdpagent:
   def close(self):
     self._sock.close()
 
+  @property
+  def family(self) -> int:
+    return self._family
+
+  @property
+  def sock(self) -> socket.socket:
+    """The underlying UDP socket, e.g. to be drained by an ssdpreceiver."""
+    return self._sock
+
+  @property
+  def host(self) -> str:
+    """The value of the HOST header of searches sent by this agent."""
+    return self._host
+
   def write_object(self, obj) -> int:
+    if isinstance(obj, msearchtemplate):
+      obj = obj.forhost(self._host)
+    if self._window is not None:
+      self._window.start(obj)
     return self._sock.sendto(bytes(obj), self._address)
 
-  def prepare_iter(self, amount: int):
-    self._iter_amount = amount
+  def schedule(self, obj, delay: float = 0):
+    """Sends the given object after delay seconds while iterating."""
+    if isinstance(obj, msearchtemplate):
+      obj = obj.forhost(self._host)
+    due = time.monotonic() + delay
+    if self._window is not None:
+      self._window.start(obj, delay)
+    heapq.heappush(self._pending, (due, len(self._pending), bytes(obj)))
 
-  def interrupt(self):
-    self._iter_amount = 0
+  def search(self, template: msearchtemplate, schedule: ssdpschedule = None):
+    """Sends the given search according to the schedule while iterating."""
+    if schedule is None:
+      self.write_object(template)
+      return
+    for delay in schedule.delays(template.mx):
+      self.schedule(template, delay)
+
+  def _flush(self) -> float:
+    """Sends all due objects and returns the seconds until the next one."""
+    now = time.monotonic()
+    while self._pending and self._pending[0][0] <= now:
+      _, _, payload = heapq.heappop(self._pending)
+      try:
+        self._sock.sendto(payload, self._address)
+      except OSError as error:
+        self._notify_handlers(error)
+    if self._pending:
+      return self._pending[0][0] - now
+
+  @property
+  def window(self) -> ssdpwindow:
+    return self._window
 
   def _notify_handlers(self, error):
     for handler in self._error__handlers:
       handler(error)
     
   def __iter__(self):
-    try:
-      counter = 0
-      while True:
-        if self._iter_amount > 0 and self._iter_amount <= counter:
-          break
-        counter += 1
-        data, address = self._sock.recvfrom(1024)
-        yield Message(raw_data=str(data, 'utf-8')), address[0], address[1]
-    except socket.timeout as tout:
-      self._notify_handlers(tout)
+    self._reason = None
+    counter = 0
+    while not self._stopped(counter):
+      timeout = self._next_timeout(self._flush())
+      if timeout is None:
+        break
+
+      self._sock.settimeout(timeout)
+      try:
+        data, address = self._sock.recvfrom(self._bufsize)
+      except socket.timeout as tout:
+        if self._timed_out(tout, bool(self._pending)):
+          continue
+        break
+
+      if self._recorder is not None:
+        self._recorder(data, address)
+      message = self._accept(data)
+      if message is None:
+        continue
+      counter += 1
+      yield message, address[0], address[1]
   
   def __enter__(self) -> 'ssdpagent':
     return self
@@ -91,35 +200,164 @@ class ssdpagent:
     self.close()
   
 class ssdphost:
+  __slots__ = ('_host', '_devices', '_known', '_interfaces')
+
   def __init__(self, host: str) -> None:
     self._host = host
     self._devices= []
+    self._known = set()
+    self._interfaces = []
   
   @property
   def host(self) -> str:
     return self._host
 
+  @property
+  def interfaces(self) -> list:
+    """Local interfaces (names or addresses) this host has been seen on."""
+    return self._interfaces
+
+  def add_interface(self, iface: str):
+    if iface is not None and iface not in self._interfaces:
+      self._interfaces.append(iface)
+
   @property
   def locations(self) -> list:
     return self._devices
+
+  def add_location(self, location: str) -> bool:
+    if location in self._known:
+      return False
+    self._known.add(location)
+    self._devices.append(location)
+    return True
   
   def __iadd__(self, other):
-    if other.value not in self._devices:
-      self._devices.append(other.value)
+    self.add_location(other.value)
     return self
+
+  def __contains__(self, location: str) -> bool:
+    return location in self._known
   
   def __repr__(self) -> str:
     return '<Host target="%s", devices=%d>' % (self.host, len(self.locations))
 
+def parse_usn(usn: str) -> tuple: # tuple[str, str]
+  """Splits a USN into the UDN and the (optional) notification type.
+
+  'uuid:device-UUID::urn:schemas-upnp-org:service:serviceType:ver' results in
+  ('uuid:device-UUID', 'urn:schemas-upnp-org:service:serviceType:ver').
+  """
+  if not usn: return (None, None)
+  udn, _, target = usn.partition('::')
+  return udn, (target or None)
+
 class ssdpresult:
+  """Discovery result store.
+
+  Besides the hosts, all responses are indexed by UDN, location and search 
+  target (ST/NT). Devices send several replies (root device, UDN and one per
+  device/service type), locations() returns each description URL once, so 
+  that every description has to be fetched only once.
+  """
   def __init__(self) -> None:
-    self._hosts = {} # type: list[ssdphost]
+    self._hosts = {} # type: dict[str, ssdphost]
+    self._udns = {} # udn -> {location: None}
+    self._locations = {} # location -> {udn: None}
+    self._targets = {} # st -> {location: None}
+    self._seen = set() # (usn, location)
+    self.responses = 0
+    self.duplicates = 0
+    self.unlocated = 0 # responses without LOCATION header
+
+  def add(self, message: Message, host: str, iface: str = None) -> bool:
+    """Adds a response or announcement and returns True if its location is new."""
+    self.responses += 1
+    location = message['LOCATION']
+    if location is None:
+      self.unlocated += 1
+      return False
+    location = location.value
+
+    usn = message['USN'].value if 'USN' in message else None
+    if (usn, location) in self._seen:
+      self.duplicates += 1
+    else:
+      self._seen.add((usn, location))
+
+    if host not in self._hosts:
+      self._hosts[host] = ssdphost(host)
+    self._hosts[host].add_location(location)
+    self._hosts[host].add_interface(iface)
+
+    is_new = location not in self._locations
+    udns = self._locations.setdefault(location, {})
+    udn, _ = parse_usn(usn)
+    if udn:
+      udns[udn] = None
+      self._udns.setdefault(udn, {})[location] = None
+    target = message['ST'] or message['NT']
+    if target is not None:
+      self._targets.setdefault(target.value, {})[location] = None
+    return is_new
+
+  def merge(self, other: 'ssdpresult') -> 'ssdpresult':
+    """Merges all hosts, indexes and counters of another result into this one."""
+    for name in other:
+      source = other[name]
+      if name not in self._hosts:
+        self._hosts[name] = ssdphost(name)
+      host = self._hosts[name]
+      for location in source.locations:
+        host.add_location(location)
+      for iface in source.interfaces:
+        host.add_interface(iface)
+
+    for location, udns in other._locations.items():
+      self._locations.setdefault(location, {}).update(udns)
+    for udn, locations in other._udns.items():
+      self._udns.setdefault(udn, {}).update(locations)
+    for target, locations in other._targets.items():
+      self._targets.setdefault(target, {}).update(locations)
+
+    self.duplicates += other.duplicates + len(self._seen & other._seen)
+    self.unlocated += other.unlocated
+    self._seen |= other._seen
+    self.responses += other.responses
+    return self
+
+  def locations(self) -> list:
+    """All unique description URLs."""
+    return list(self._locations)
+
+  @property
+  def udns(self) -> list:
+    return list(self._udns)
+
+  def by_udn(self, udn: str) -> list:
+    """Locations announced for the given UDN (with or without 'uuid:')."""
+    if not udn.startswith('uuid:'):
+      udn = 'uuid:%s' % udn
+    return list(self._udns.get(udn, ()))
+
+  def by_location(self, location: str) -> list:
+    """UDNs announced with the given location."""
+    return list(self._locations.get(location, ()))
+
+  def by_st(self, st: str) -> list:
+    """Locations that answered for the given search (or notification) target."""
+    return list(self._targets.get(st, ()))
+
+  def by_host(self, host: str) -> list:
+    return list(self._hosts[host].locations) if host in self else []
 
   def __iter__(self) -> Iterator[str]:
     return iter(self._hosts)
 
   def __setitem__(self, key: str, host: ssdphost):
     self._hosts[key] = host
+    for location in host.locations:
+      self._locations.setdefault(location, {})
   
   def __getitem__(self, key: str) -> ssdphost:
     if key in self:
@@ -138,6 +376,7 @@ class ssdpresult:
       host, device = other
       if host in self:
         self[host] += device
+        self._locations.setdefault(device.value, {})
     else:
       self[other.host] = other
     return self
@@ -145,18 +384,85 @@ class ssdpresult:
   def __repr__(self) -> str:
     return repr(self._hosts)
 
-def ssdp_discover(address: str) -> ssdpresult:
+def _collect(result: ssdpresult, packet: Message, address: str, 
+             iface: str = None) -> bool:
+  return result.add(packet, address, iface)
+
+def ssdp_stream(address: str, result: ssdpresult = None, callback = None,
+                window: ssdpwindow = None, schedule: ssdpschedule = None,
+                ipv6 = None) -> Iterator[tuple]: # Iterator[tuple[ssdphost, str]]
+  """Yields (host, location) tuples as soon as a new unique location arrives.
+
+  The description of a device can be fetched while the MX window is still 
+  open. All received messages are collected into the given result, and the 
+  optional callback is invoked with the same arguments as yielded. The search
+  ends as defined by the given window (default: MX + 1s, 1s quiet interval)
+  and the search is retransmitted as defined by the schedule (default: once).
+
+  If ipv6 is True (or a list of interface names), the IPv6 link-local group
+  is searched at the same time; IPv6 hosts are keyed with their scope.
+  """
+  if result is None:
+    result = ssdpresult()
+  if window is None:
+    window = ssdpwindow()
+  if schedule is None:
+    schedule = ssdpschedule()
+  if ipv6:
+    from .multi import ssdpmultiagent
+    # address None: one unbound IPv4 agent, as without ipv6
+    client = ssdpmultiagent(addresses=[address], window=window, ipv6=ipv6)
+  else:
+    client = ssdpagent(address=address, window=window)
+
+  with client:
+    client.search(msearch_template(mx=window.mx), schedule)
+    for item in client:
+      packet, address = item[0], item[1]
+      iface = item[3] if len(item) > 3 else None
+      if _collect(result, packet, address, iface):
+        host, location = result[address], packet['LOCATION'].value
+        if callback: callback(host, location)
+        yield host, location
+
+def ssdp_discover(address: str, callback = None, window: ssdpwindow = None,
+                  schedule: ssdpschedule = None, ipv6 = None) -> ssdpresult:
   result = ssdpresult()
-  with ssdpagent(address=address) as client:
-    client.write_object(build_msearch())
-    for packet, address, port in client:
-      if 'LOCATION' in packet:
-        if address in result:
-          result +=  (address, packet['LOCATION'])
-        else:
-          host = ssdphost(address)
-          host += packet['LOCATION']
-          result += host
-      else:
-        print(address)
+  for _ in ssdp_stream(address, result, callback, window, schedule, ipv6):
+    pass
   return result
+
+def ssdp_search(targets: list, address: str = None, mx: int = 2, 
+                spread: float = None, window: ssdpwindow = None,
+                schedule: ssdpschedule = None) -> dict: # dict[str, ssdpresult]
+  """Searches for several targets at once on a single socket.
+
+  One M-SEARCH per target is sent, spread over the first spread seconds 
+  (default: half of MX). Responses are routed by their ST header into one 
+  ssdpresult per target; responses that match no target are collected into
+  the 'ssdp:all' result if that target has been requested. An optional 
+  schedule retransmits every search relative to its first send.
+  """
+  results = {}
+  for st in targets:
+    results[st] = ssdpresult()
+  if window is None:
+    window = ssdpwindow(mx=mx)
+  if spread is None:
+    spread = mx / 2
+  step = spread / (len(targets) - 1) if len(targets) > 1 else 0
+
+  with ssdpagent(address=address, window=window) as client:
+    for index, st in enumerate(targets):
+      template = msearch_template(st=st, mx=mx)
+      delays = schedule.delays(mx) if schedule is not None else [0]
+      for delay in delays:
+        client.schedule(template, index * step + delay)
+    for packet, address, port in client:
+      st = packet['ST']
+      result = results.get(st.value) if st is not None else None
+      if result is None:
+        result = results.get('ssdp:all')
+      if result is not None:
+        _collect(result, packet, address)
+  return results
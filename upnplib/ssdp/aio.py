@@ -0,0 +1,176 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+asyncio based counterpart of the ssdpagent. Datagrams are delivered by a 
+DatagramProtocol into a queue, so that many searches can share one event loop
+with other (control) traffic.
+"""
+import asyncio
+
+from . import (
+  SSDP_MULTICAST,
+  SSDP_PORT,
+
+  ssdpcache,
+  msearchtemplate,
+
+  msearch_template
+)
+from .window import ssdpwindow, ssdpschedule, _receiveloop
+from .agent import (
+  _ssdpsocket,
+  _collect,
+
+  ssdpresult
+)
+
+class ssdpprotocol(asyncio.DatagramProtocol):
+  def __init__(self, queue: asyncio.Queue) -> None:
+    self._queue = queue
+
+  def datagram_received(self, data: bytes, addr: tuple):
+    self._queue.put_nowait((data, addr))
+
+  def error_received(self, exc: Exception):
+    self._queue.put_nowait(exc)
+
+  def connection_lost(self, exc: Exception):
+    self._queue.put_nowait(None)
+
+class aiossdpagent(_receiveloop):
+  """Asynchronous SSDP agent.
+
+  The socket is configured the same way as in ssdpagent. Iteration stops if no
+  message has been received within the given timeout:
+
+  >>> async with aiossdpagent(address='192.168.0.2') as agent:
+  ...   agent.write_object(build_msearch())
+  ...   async for message, host, port in agent:
+  ...     print(host, message['LOCATION'])
+  """
+  def __init__(self, ttl: int = 2, address: str = None, iface: str = None,
+               timeout: float = 5, window: ssdpwindow = None,
+               cache: ssdpcache = None) -> None:
+    self._error__handlers = []
+    self._cache = cache
+    self._iter_amount = -1
+    self._timeout = timeout
+    self._window = window
+    self._reason = None
+    self._malformed = 0
+
+    self._sock = _ssdpsocket(ttl, address, iface)
+    self._sock.setblocking(False)
+    self._queue = asyncio.Queue()
+    self._transport = None
+
+  async def open(self) -> 'aiossdpagent':
+    if self._transport is None:
+      loop = asyncio.get_running_loop()
+      self._transport, _ = await loop.create_datagram_endpoint(
+        lambda: ssdpprotocol(self._queue), sock=self._sock
+      )
+    return self
+
+  def add_error_handler(self, handler):
+    if handler: self._error__handlers.append(handler)
+
+  def close(self):
+    if self._transport is not None:
+      self._transport.close()
+    else:
+      self._sock.close()
+
+  def write_object(self, obj):
+    if self._window is not None:
+      self._window.start(obj)
+    self._transport.sendto(bytes(obj), (SSDP_MULTICAST, SSDP_PORT))
+
+  def schedule(self, obj, delay: float = 0):
+    """Sends the given object after delay seconds."""
+    if self._window is not None:
+      self._window.start(obj, delay)
+    asyncio.get_running_loop().call_later(delay, self._send_later, bytes(obj))
+
+  def _send_later(self, payload: bytes):
+    if self._transport is not None and not self._transport.is_closing():
+      self._transport.sendto(payload, (SSDP_MULTICAST, SSDP_PORT))
+
+  def search(self, template: msearchtemplate, schedule: ssdpschedule = None):
+    """Sends the given search according to the schedule."""
+    if schedule is None:
+      self.write_object(template)
+      return
+    for delay in schedule.delays(template.mx):
+      self.schedule(template, delay)
+
+  def _notify_handlers(self, error):
+    for handler in self._error__handlers:
+      handler(error)
+
+  async def __aiter__(self):
+    self._reason = None
+    counter = 0
+    while not self._stopped(counter):
+      timeout = self._next_timeout()
+      if timeout is None:
+        break
+      try:
+        item = await asyncio.wait_for(self._queue.get(), timeout)
+      except asyncio.TimeoutError as tout:
+        self._timed_out(tout)
+        break
+
+      if item is None:
+        break
+      if isinstance(item, Exception):
+        self._notify_handlers(item)
+        continue
+
+      data, address = item
+      message = self._accept(data)
+      if message is None:
+        continue
+      counter += 1
+      yield message, address[0], address[1]
+
+  async def __aenter__(self) -> 'aiossdpagent':
+    return await self.open()
+
+  async def __aexit__(self, exc_type, exc_value, traceback):
+    if exc_type is not None:
+      self._notify_handlers(exc_value)
+    self.close()
+
+async def ssdp_discover_async(address: str, timeout: float = 5,
+                              window: ssdpwindow = None,
+                              schedule: ssdpschedule = None) -> ssdpresult:
+  result = ssdpresult()
+  if window is None:
+    window = ssdpwindow()
+  if schedule is None:
+    schedule = ssdpschedule()
+  async with aiossdpagent(address=address, timeout=timeout, window=window) as client:
+    client.search(msearch_template(mx=window.mx), schedule)
+    async for packet, address, port in client:
+      _collect(result, packet, address)
+  return result
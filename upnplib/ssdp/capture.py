@@ -0,0 +1,274 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Recording of raw SSDP datagrams to an append-only capture log and offline 
+replay of capture logs or pcap files through the Message parser and the 
+ssdpresult aggregation.
+"""
+import collections
+import concurrent.futures
+import socket
+import struct
+import time
+
+from typing import Iterator
+
+from . import SSDP_PORT, ssdpcache, parse_message
+from .agent import ssdpresult
+
+CAPTURE_MAGIC = b'SSDPCAP1'
+
+# timestamp, address length, port, payload length
+_RECORD = struct.Struct('<dBHI')
+
+class ssdprecorder:
+  """Appends raw datagrams with their timestamp and source to a capture log.
+
+  Instances are callable with (data, address), so they can be used as the 
+  prn callback of upnp.low.UDP.UDPMulticastListener.listen() as well.
+  """
+  def __init__(self, path: str) -> None:
+    self._path = path
+    self._fp = open(path, 'ab')
+    if self._fp.tell() == 0:
+      self._fp.write(CAPTURE_MAGIC)
+    self._count = 0
+
+  @property
+  def count(self) -> int:
+    return self._count
+
+  def write(self, data: bytes, address: tuple, timestamp: float = None):
+    host = address[0].encode('utf-8')
+    if timestamp is None:
+      timestamp = time.time()
+    self._fp.write(_RECORD.pack(timestamp, len(host), address[1], len(data)))
+    self._fp.write(host)
+    self._fp.write(data)
+    self._count += 1
+
+  def __call__(self, data: bytes, address: tuple):
+    self.write(data, address)
+
+  def flush(self):
+    self._fp.flush()
+
+  def close(self):
+    self._fp.close()
+
+  def __enter__(self) -> 'ssdprecorder':
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+def read_capture(path: str) -> Iterator[tuple]: # Iterator[tuple[float, bytes, tuple]]
+  """Yields (timestamp, data, (host, port)) records of a capture log."""
+  with open(path, 'rb') as fp:
+    if fp.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+      raise ValueError('Not a SSDP capture log: %s' % path)
+    while True:
+      head = fp.read(_RECORD.size)
+      if len(head) < _RECORD.size:
+        # end of file (or an incomplete last record)
+        return
+      timestamp, host_len, port, data_len = _RECORD.unpack(head)
+      host = fp.read(host_len)
+      data = fp.read(data_len)
+      if len(data) < data_len:
+        return
+      yield timestamp, data, (host.decode('utf-8'), port)
+
+# pcap link types
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = (101, 12)
+_LINKTYPE_LINUX_SLL = 113
+_LINKTYPE_LINUX_SLL2 = 276
+
+def _decode_frame(linktype: int, frame: bytes) -> tuple:
+  """Returns the (ip version, ip packet) of a captured frame."""
+  if linktype == _LINKTYPE_ETHERNET:
+    offset, ethertype = 14, frame[12:14]
+    while ethertype in (b'\x81\x00', b'\x88\xa8'):
+      ethertype = frame[offset + 2:offset + 4]
+      offset += 4
+  elif linktype == _LINKTYPE_LINUX_SLL:
+    offset, ethertype = 16, frame[14:16]
+  elif linktype == _LINKTYPE_LINUX_SLL2:
+    offset, ethertype = 20, frame[0:2]
+  elif linktype == _LINKTYPE_NULL:
+    return frame[4] >> 4, frame[4:]
+  elif linktype in _LINKTYPE_RAW:
+    return frame[0] >> 4, frame
+  else:
+    return None, None
+
+  if ethertype == b'\x08\x00': return 4, frame[offset:]
+  if ethertype == b'\x86\xdd': return 6, frame[offset:]
+  return None, None
+
+def _decode_udp(version: int, packet: bytes, port: int) -> tuple:
+  """Returns the (payload, (host, port)) of a UDP datagram from/to port."""
+  if version == 4:
+    if len(packet) < 20 or packet[9] != 17: return None
+    # skip fragments
+    if struct.unpack('!H', packet[6:8])[0] & 0x3fff: return None
+    offset = (packet[0] & 0x0f) * 4
+    host = socket.inet_ntop(socket.AF_INET, packet[12:16])
+  elif version == 6:
+    if len(packet) < 40 or packet[6] != 17: return None
+    offset = 40
+    host = socket.inet_ntop(socket.AF_INET6, packet[8:24])
+  else:
+    return None
+
+  sport, dport, length = struct.unpack('!HHH', packet[offset:offset + 6])
+  if port not in (sport, dport): return None
+  return packet[offset + 8:offset + length], (host, sport)
+
+def read_pcap(path: str, port: int = SSDP_PORT) -> Iterator[tuple]: # Iterator[tuple[float, bytes, tuple]]
+  """Yields (timestamp, data, (host, port)) of all SSDP datagrams of a pcap file.
+
+  Only the classic pcap format is supported (not pcapng).
+  """
+  with open(path, 'rb') as fp:
+    head = fp.read(24)
+    magic = head[:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+      order = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+      order = '>'
+    else:
+      raise ValueError('Not a pcap file: %s' % path)
+    nano = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+    linktype = struct.unpack(order + 'I', head[20:24])[0] & 0x0fffffff
+
+    record = struct.Struct(order + 'IIII')
+    while True:
+      rhead = fp.read(record.size)
+      if len(rhead) < record.size:
+        return
+      seconds, fraction, incl_len, _ = record.unpack(rhead)
+      frame = fp.read(incl_len)
+      if len(frame) < incl_len:
+        return
+
+      version, packet = _decode_frame(linktype, frame)
+      if packet is None: continue
+      try:
+        datagram = _decode_udp(version, packet, port)
+      except (struct.error, ValueError):
+        continue
+      if datagram is None: continue
+      timestamp = seconds + fraction / (1e9 if nano else 1e6)
+      yield timestamp, datagram[0], datagram[1]
+
+def read_records(path: str, port: int = SSDP_PORT) -> Iterator[tuple]:
+  """Reads a capture log or pcap file, depending on its header."""
+  with open(path, 'rb') as fp:
+    magic = fp.read(len(CAPTURE_MAGIC))
+  if magic == CAPTURE_MAGIC:
+    return read_capture(path)
+  return read_pcap(path, port)
+
+class replaystats:
+  """Counters and throughput of a replay."""
+  def __init__(self) -> None:
+    self.datagrams = 0
+    self.malformed = 0
+    self.seconds = 0.0
+
+  @property
+  def rate(self) -> float:
+    """Parsed datagrams per second."""
+    return self.datagrams / self.seconds if self.seconds else 0.0
+
+  def __repr__(self) -> str:
+    return '<replaystats datagrams=%d, malformed=%d, rate=%.0f/s>' % (
+      self.datagrams, self.malformed, self.rate
+    )
+
+def _ingest(records: list, cache: ssdpcache = None) -> tuple: # tuple[ssdpresult, int]
+  result = ssdpresult()
+  malformed = 0
+  for data, host in records:
+    try:
+      message = parse_message(data, cache)
+    except ValueError:
+      malformed += 1
+      continue
+    result.add(message, host)
+  return result, malformed
+
+def _chunks(path: str, port: int, size: int):
+  chunk = []
+  for _, data, address in read_records(path, port):
+    chunk.append((data, address[0]))
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+def _merge(result: ssdpresult, stats: replaystats, 
+           future: concurrent.futures.Future) -> None:
+  partial, malformed = future.result()
+  result.merge(partial)
+  stats.malformed += malformed
+
+def replay(path: str, result: ssdpresult = None, port: int = SSDP_PORT, 
+           cache: ssdpcache = None, processes: int = None, 
+           chunksize: int = 50000) -> tuple: # tuple[ssdpresult, replaystats]
+  """Replays a capture log or pcap file at full speed.
+
+  All datagrams are parsed and aggregated into the given (or a new) 
+  ssdpresult. If processes is given, chunks of chunksize datagrams are parsed
+  in a process pool and the partial results are merged afterwards (the 
+  given cache is only used without a process pool).
+  """
+  if result is None:
+    result = ssdpresult()
+  stats = replaystats()
+  start = time.perf_counter()
+
+  if not processes:
+    for chunk in _chunks(path, port, chunksize):
+      partial, malformed = _ingest(chunk, cache)
+      result.merge(partial)
+      stats.datagrams += len(chunk)
+      stats.malformed += malformed
+  else:
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+      futures = collections.deque()
+      for chunk in _chunks(path, port, chunksize):
+        stats.datagrams += len(chunk)
+        futures.append(executor.submit(_ingest, chunk))
+        # at most 2 chunks per process are read ahead of the merge
+        if len(futures) >= 2 * processes:
+          _merge(result, stats, futures.popleft())
+      # merge in submission order to keep the result deterministic
+      while futures:
+        _merge(result, stats, futures.popleft())
+
+  stats.seconds = time.perf_counter() - start
+  return result, stats
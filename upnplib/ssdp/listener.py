@@ -0,0 +1,328 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Passive SSDP listener. NOTIFY messages (ssdp:alive, ssdp:update, ssdp:byebye)
+are collected into a device table keyed by USN, which honors the max-age value
+of each announcement.
+"""
+import heapq
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from enum import Enum
+
+from . import (
+  SSDP_MULTICAST,
+  SSDP_PORT,
+
+  Message,
+  ssdpmethod,
+  ssdpcache,
+  parse_message
+)
+
+# announcements without CACHE-CONTROL are kept for the minimum defined by 
+# the UPnP architecture
+DEFAULT_MAX_AGE = 1800
+
+class ssdpevent(Enum):
+  ADDED = 'added'
+  UPDATED = 'updated'
+  REMOVED = 'removed'
+
+def max_age(message: Message, default: int = DEFAULT_MAX_AGE) -> int:
+  """Extracts the max-age directive of the CACHE-CONTROL header."""
+  field = message['CACHE-CONTROL']
+  if field is None: return default
+  for directive in field.value.split(','):
+    name, _, value = directive.partition('=')
+    if name.strip().lower() == 'max-age':
+      try:
+        return int(value.strip())
+      except ValueError:
+        break
+  return default
+
+class ssdpentry:
+  """A device (or service) announcement stored in the ssdptable."""
+  def __init__(self, usn: str, host: str, message: Message, 
+               now: float) -> None:
+    self._usn = usn
+    self._values = None
+    self.update(host, message, now)
+
+  def update(self, host: str, message: Message, now: float) -> bool:
+    """Applies the given message and returns True if announced values changed."""
+    values = (
+      host,
+      message['LOCATION'].value if 'LOCATION' in message else None,
+      (message['NT'] or message['ST']).value if 'NT' in message or 'ST' in message else None,
+      message['SERVER'].value if 'SERVER' in message else None,
+      message['BOOTID.UPNP.ORG'].value if 'BOOTID.UPNP.ORG' in message else None,
+      message['CONFIGID.UPNP.ORG'].value if 'CONFIGID.UPNP.ORG' in message else None
+    )
+    changed = self._values != values
+    self._values = values
+    self._max_age = max_age(message)
+    self._last_seen = now
+    self._expires = now + self._max_age
+    return changed
+
+  @property
+  def usn(self) -> str:
+    return self._usn
+
+  @property
+  def host(self) -> str:
+    return self._values[0]
+
+  @property
+  def location(self) -> str:
+    return self._values[1]
+
+  @property
+  def nt(self) -> str:
+    """The notification (or search) target."""
+    return self._values[2]
+
+  @property
+  def server(self) -> str:
+    return self._values[3]
+
+  @property
+  def bootid(self) -> str:
+    return self._values[4]
+
+  @property
+  def configid(self) -> str:
+    return self._values[5]
+
+  @property
+  def max_age(self) -> int:
+    return self._max_age
+
+  @property
+  def last_seen(self) -> float:
+    return self._last_seen
+
+  @property
+  def expires(self) -> float:
+    return self._expires
+
+  def __repr__(self) -> str:
+    return '<ssdpentry usn="%s", location="%s", max-age=%d>' % (
+      self.usn, self.location, self.max_age
+    )
+
+class ssdptable:
+  """In-memory device table keyed by USN.
+
+  Expiry uses a heap of (expires, usn) tuples, outdated heap entries of 
+  refreshed devices are skipped when they are popped. Handlers are called 
+  with (event, entry) for every added, updated or removed device.
+  """
+  def __init__(self, clock = time.monotonic) -> None:
+    self._entries = {}
+    self._heap = []
+    self._handlers = []
+    self._clock = clock
+    self._lock = threading.RLock()
+
+  def add_handler(self, handler):
+    if handler: self._handlers.append(handler)
+
+  def _notify_handlers(self, event: ssdpevent, entry: ssdpentry):
+    for handler in self._handlers:
+      handler(event, entry)
+
+  def ingest(self, message: Message, host: str) -> ssdpevent:
+    """Applies a NOTIFY message or search response and returns the raised event."""
+    usn = message['USN']
+    if usn is None: return None
+    usn = usn.value
+
+    nts = message['NTS'].value if 'NTS' in message else None
+    now = self._clock()
+    with self._lock:
+      entry = self._entries.get(usn)
+      if nts == 'ssdp:byebye':
+        if entry is None: return None
+        del self._entries[usn]
+        event = ssdpevent.REMOVED
+      elif message.method not in (ssdpmethod.NOTIFY, ssdpmethod.OK):
+        return None
+      elif entry is None:
+        entry = ssdpentry(usn, host, message, now)
+        self._entries[usn] = entry
+        heapq.heappush(self._heap, (entry.expires, usn))
+        event = ssdpevent.ADDED
+      else:
+        changed = entry.update(host, message, now)
+        heapq.heappush(self._heap, (entry.expires, usn))
+        if not changed and nts != 'ssdp:update':
+          return None
+        event = ssdpevent.UPDATED
+
+    self._notify_handlers(event, entry)
+    return event
+
+  def expire(self) -> list:
+    """Removes all expired entries and returns them."""
+    now = self._clock()
+    expired = []
+    with self._lock:
+      while self._heap and self._heap[0][0] <= now:
+        expires, usn = heapq.heappop(self._heap)
+        entry = self._entries.get(usn)
+        if entry is not None and entry.expires == expires:
+          del self._entries[usn]
+          expired.append(entry)
+    for entry in expired:
+      self._notify_handlers(ssdpevent.REMOVED, entry)
+    return expired
+
+  def next_expiry(self) -> float:
+    """Seconds until the next entry may expire, None if the table is empty."""
+    with self._lock:
+      if not self._heap: return None
+      return max(0, self._heap[0][0] - self._clock())
+
+  def __getitem__(self, usn: str) -> ssdpentry:
+    return self._entries.get(usn)
+
+  def __contains__(self, usn: str) -> bool:
+    return usn in self._entries
+
+  def __iter__(self):
+    with self._lock:
+      return iter(list(self._entries.values()))
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __repr__(self) -> str:
+    return '<ssdptable devices=%d>' % len(self)
+
+def _listensocket(address: str = None, port: int = SSDP_PORT) -> socket.socket:
+  sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  if hasattr(socket, 'SO_REUSEPORT'):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+  mreq = socket.inet_aton(SSDP_MULTICAST)
+  if address is not None:
+    mreq += socket.inet_aton(address)
+  else:
+    mreq += struct.pack('@I', socket.INADDR_ANY)
+  sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+  sock.bind(('', port))
+  return sock
+
+class ssdplistener:
+  """Long-running passive listener that keeps a ssdptable up to date.
+
+  No search is sent; the table is filled from announcements only. Expired
+  entries are removed as soon as their max-age has elapsed:
+
+  >>> listener = ssdplistener(cache=ssdpcache())
+  >>> listener.table.add_handler(lambda event, entry: print(event, entry))
+  >>> listener.start()
+  """
+  def __init__(self, address: str = None, port: int = SSDP_PORT, 
+               table: ssdptable = None, cache: ssdpcache = None,
+               bufsize: int = 8192, sock: socket.socket = None,
+               recorder = None) -> None:
+    self._recorder = recorder
+    self._sock = sock if sock is not None else _listensocket(address, port)
+    self._sock.setblocking(False)
+    self._table = table if table is not None else ssdptable()
+    self._cache = cache
+    self._bufsize = bufsize
+    self._malformed = 0
+    self._stopped = threading.Event()
+    self._thread = None
+
+  @property
+  def table(self) -> ssdptable:
+    return self._table
+
+  @property
+  def malformed(self) -> int:
+    """Amount of received datagrams that could not be parsed."""
+    return self._malformed
+
+  def listen(self, duration: float = None):
+    """Receives announcements until stopped or the given duration has elapsed."""
+    end = None if duration is None else time.monotonic() + duration
+    with selectors.DefaultSelector() as selector:
+      selector.register(self._sock, selectors.EVENT_READ)
+      while not self._stopped.is_set():
+        timeout = self._table.next_expiry()
+        # wake up regularly to check whether this listener has been stopped
+        timeout = 0.5 if timeout is None else min(timeout, 0.5)
+        if end is not None:
+          if end <= time.monotonic(): break
+          timeout = min(timeout, end - time.monotonic())
+
+        if selector.select(max(0, timeout)):
+          self._drain()
+        self._table.expire()
+
+  def _drain(self):
+    while True:
+      try:
+        data, address = self._sock.recvfrom(self._bufsize)
+      except (BlockingIOError, InterruptedError):
+        return
+      if self._recorder is not None:
+        self._recorder(data, address)
+      try:
+        message = parse_message(data, self._cache)
+      except ValueError:
+        self._malformed += 1
+        continue
+      self._table.ingest(message, address[0])
+
+  def start(self):
+    if self._thread is None:
+      self._stopped.clear()
+      self._thread = threading.Thread(target=self.listen, daemon=True)
+      self._thread.start()
+
+  def stop(self):
+    self._stopped.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def close(self):
+    self.stop()
+    self._sock.close()
+
+  def __enter__(self) -> 'ssdplistener':
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
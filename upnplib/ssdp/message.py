@@ -20,13 +20,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import functools
+import threading
+
 from typing import Iterator
 from enum import Enum
+from collections import OrderedDict
 
 from . import (
   SSDP_MULTICAST,
   SSDP_PORT
 )
+from ..utils import _intern
 
 class ssdpmethod(Enum):
   MSEARCH = 'M-SEARCH'
@@ -35,9 +40,10 @@ class ssdpmethod(Enum):
 
   @staticmethod
   def valueof(name: str) -> 'ssdpmethod':
-    for const in ssdpmethod:
-      if const.value == name:
-        return const
+    try:
+      return ssdpmethod(name)
+    except ValueError:
+      return None
 
 class man(Enum):
   """It defines the scope (namespace) of the extension."""
@@ -51,13 +57,15 @@ class man(Enum):
     return 'ssdp:%s' % self.value
 
 class Field:
+  __slots__ = ('_name', '_value')
+
   def __init__(self, name: str = None, value:str = None,
                line: str = None) -> None:
     self._name = name
     self._value = value
     if line :
       i = line.index(':')
-      self._name = line[:i]
+      self._name = _intern(line[:i])
       self._value = line[i + 1:].strip()
   
   def __repr__(self) -> str:
@@ -75,65 +83,108 @@ class Field:
     return self._name
   
 class Message:
+  """A SSDP message (M-SEARCH, NOTIFY or search response).
+
+  Raw datagrams can be given as str or bytes-like objects. Header names are 
+  normalized once when parsing and header values are wrapped into Field 
+  objects on first access only. A ValueError is raised if the given data is
+  not a valid SSDP message.
+  """
   def __init__(self, method: ssdpmethod = ssdpmethod.NOTIFY, path: str = None, 
                http_version: str = 'HTTP/1.1', headers: dict = None, 
                raw_data: str = None) -> None:
     self._method = method
     self._path = path
     self._http_ver = http_version
-    self._headers = {}
+    self._names = {}  # lower name -> name
+    self._headers = {}  # lower name -> Field or raw value (bytes)
+    self._frozen = False
     if headers:
       for name in headers:
-        self._headers[name.lower()] = headers[name]
+        field = headers[name]
+        field._name = name.lower()
+        self[field._name] = field
     if raw_data is not None:
-      fields = raw_data.replace('\r', '').splitlines()
-      local1, local2, local3 = fields[0].split(' ')
-      if local1.startswith('HTTP'):
-        self._http_ver = local1
-        self._method = ssdpmethod.valueof(local3)
-        self._path = int(local2)
-      else:
-        self._http_ver = local3
-        self._method = ssdpmethod.valueof(local1)
-        self._path = local2
-    
-      # now load all header fields
-      for line in fields[1:]:
-        if not line: continue
-        field = Field(line=line)
-        self[field.name] = field
-    
-    for f_name in self:
-      self[f_name]._name = f_name
+      self._parse(raw_data)
+
+  def _parse(self, raw_data):
+    if isinstance(raw_data, str):
+      data = raw_data.encode('utf-8')
+    else:
+      data = bytes(raw_data)
+    if b'\r' in data:
+      data = data.replace(b'\r', b'')
+    lines = data.split(b'\n')
+
+    head = lines[0].split(b' ', 2)
+    if len(head) != 3:
+      raise ValueError('Malformed SSDP start line: %r' % lines[0][:64])
+    local1, local2, local3 = [x.decode('latin-1') for x in head]
+    if local1.startswith('HTTP'):
+      self._http_ver = local1
+      self._method = ssdpmethod.valueof(local3)
+      self._path = int(local2)
+    else:
+      self._http_ver = local3
+      self._method = ssdpmethod.valueof(local1)
+      self._path = local2
+
+    # header values are stored as bytes until they are accessed
+    names = self._names
+    headers = self._headers
+    for line in lines[1:]:
+      if not line: continue
+      name, sep, value = line.partition(b':')
+      if not sep:
+        raise ValueError('Malformed SSDP header line: %r' % line[:64])
+      # header names repeat in every message
+      name = _intern(name.strip().decode('latin-1'))
+      key = _intern(name.lower())
+      names[key] = name
+      headers[key] = value.strip()
   
   @property
   def method(self) -> ssdpmethod:
     return self._method
 
+  @property
+  def frozen(self) -> bool:
+    return self._frozen
+
+  def freeze(self) -> 'Message':
+    """Makes this message immutable, so that it can be shared safely."""
+    for name in self._headers:
+      self[name]
+    self._frozen = True
+    return self
+
   def __getitem__(self, key: str) -> Field:
     key = key.lower()
-    for name in self._headers:
-      if name.lower() == key:
-        return self._headers[name]
+    value = self._headers.get(key)
+    if value is None or isinstance(value, Field):
+      return value
+    field = Field(self._names[key], value.decode('utf-8', 'replace'))
+    self._headers[key] = field
+    return field
   
-  def __setitem__(self, key: str, value: str):
-    self._headers[key] = value
+  def __setitem__(self, key: str, value: Field):
+    if self._frozen:
+      raise TypeError('Message is frozen')
+    name = key.lower()
+    self._names[name] = key
+    self._headers[name] = value
   
   def __len__(self) -> int:
     return len(self._headers)
   
   def __iter__(self) -> Iterator[str]:
-    return iter(self._headers)
+    return iter(self._names.values())
   
   def __bytes__(self) -> bytes:
     return repr(self).encode('utf-8')
 
   def __contains__(self, item):
-    item = item.lower()
-    for name in self._headers:
-      if name.lower() == item:
-        return True
-    return False
+    return item.lower() in self._headers
 
   def __repr__(self) -> str:
     lines = []
@@ -149,6 +200,70 @@ class Message:
     lines.append('')
     return '\r\n'.join(lines) + '\r\n'
 
+class ssdpcache:
+  """Bounded LRU cache of parsed messages keyed by their raw payload.
+
+  Devices resend byte-identical NOTIFY messages and search responses, so they
+  are parsed only once. Returned messages are frozen and shared between all
+  callers.
+  """
+  def __init__(self, maxsize: int = 1024) -> None:
+    self._maxsize = maxsize
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def parse(self, raw_data) -> Message:
+    """Returns the (cached) message for the given payload. 
+    
+    Raises ValueError for malformed payloads, which are never cached.
+    """
+    key = bytes(raw_data)
+    with self._lock:
+      message = self._entries.get(key)
+      if message is not None:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return message
+      self.misses += 1
+
+    message = Message(raw_data=key).freeze()
+    with self._lock:
+      self._entries[key] = message
+      if len(self._entries) > self._maxsize:
+        self._entries.popitem(last=False)
+    return message
+
+  @property
+  def maxsize(self) -> int:
+    return self._maxsize
+
+  @property
+  def hitrate(self) -> float:
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __repr__(self) -> str:
+    return '<ssdpcache size=%d/%d, hits=%d, misses=%d>' % (
+      len(self), self._maxsize, self.hits, self.misses
+    )
+
+def parse_message(raw_data, cache: ssdpcache = None) -> Message:
+  """Parses the given datagram, using the cache if one is given."""
+  if cache is not None:
+    return cache.parse(raw_data)
+  return Message(raw_data=raw_data)
+
 def build_msearch(host: str = SSDP_MULTICAST, port: int = SSDP_PORT, 
                   nspace: man = man.DISCOVER, st: str = 'ssdp:all',
                   mx: int = 2) -> Message:
@@ -158,3 +273,58 @@ def build_msearch(host: str = SSDP_MULTICAST, port: int = SSDP_PORT,
     'ST': Field(value=st),
     'MX': Field(value=str(mx))
   })
+
+class msearchtemplate:
+  """A pre-serialized M-SEARCH message.
+
+  The payload is built once and can be sent any number of times without 
+  rebuilding the message. Use msearch_template() to get a shared instance.
+  """
+  def __init__(self, host: str = SSDP_MULTICAST, port: int = SSDP_PORT, 
+               nspace: man = man.DISCOVER, st: str = 'ssdp:all',
+               mx: int = 2) -> None:
+    self._message = build_msearch(host, port, nspace, st, mx).freeze()
+    self._payload = bytes(self._message)
+    self._host = host
+    self._port = port
+    self._nspace = nspace
+    self._st = st
+    self._mx = mx
+
+  @property
+  def message(self) -> Message:
+    return self._message
+
+  @property
+  def payload(self) -> bytes:
+    return self._payload
+
+  @property
+  def st(self) -> str:
+    return self._st
+
+  @property
+  def mx(self) -> int:
+    return self._mx
+
+  @property
+  def host(self) -> str:
+    return self._host
+
+  def forhost(self, host: str) -> 'msearchtemplate':
+    """Returns the same search for another HOST value (e.g. '[ff02::c]')."""
+    if host == self._host: return self
+    return msearch_template(host, self._port, self._nspace, self._st, self._mx)
+
+  def __bytes__(self) -> bytes:
+    return self._payload
+
+  def __repr__(self) -> str:
+    return '<msearchtemplate st="%s", mx=%d>' % (self._st, self._mx)
+
+@functools.lru_cache(maxsize=256)
+def msearch_template(host: str = SSDP_MULTICAST, port: int = SSDP_PORT, 
+                     nspace: man = man.DISCOVER, st: str = 'ssdp:all',
+                     mx: int = 2) -> msearchtemplate:
+  """Returns the shared template for the given (ST, MX, MAN) combination."""
+  return msearchtemplate(host, port, nspace, st, mx)
@@ -0,0 +1,241 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Discovery on multi-homed hosts. One ssdpagent is opened per local interface 
+and all of them are searched at once within a single selector loop.
+"""
+import selectors
+import socket
+import struct
+
+from . import (
+  ssdpcache,
+  msearchtemplate,
+
+  msearch_template
+)
+from .window import ssdpwindow, ssdpschedule, _receiveloop
+from .agent import (
+  _collect,
+
+  ssdpagent,
+  ssdpresult
+)
+
+# ioctl request to query the IPv4 address of an interface (linux)
+SIOCGIFADDR = 0x8915
+
+def local_interfaces6(loopback: bool = False) -> list: # list[str]
+  """Returns the names of all local interfaces usable for IPv6 searches."""
+  if not socket.has_ipv6 or not hasattr(socket, 'if_nameindex'):
+    return []
+  return [name for _, name in socket.if_nameindex() if loopback or name != 'lo']
+
+def local_interfaces(loopback: bool = False) -> list: # list[tuple[str, str]]
+  """Returns (name, address) tuples for all local IPv4 interfaces.
+
+  On systems without the SIOCGIFADDR ioctl the interface name is None and the 
+  addresses resolved from the hostname are returned instead.
+  """
+  result = []
+  try:
+    import fcntl
+  except ImportError:
+    fcntl = None
+
+  if fcntl is not None and hasattr(socket, 'if_nameindex'):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+      for _, name in socket.if_nameindex():
+        try:
+          packed = fcntl.ioctl(
+            sock.fileno(), SIOCGIFADDR, struct.pack('256s', name.encode('utf-8')[:15])
+          )
+        except OSError:
+          # interface without an IPv4 address
+          continue
+        result.append((name, socket.inet_ntoa(packed[20:24])))
+  
+  if not result:
+    for info in socket.getaddrinfo(socket.gethostname(), 0, socket.AF_INET):
+      entry = (None, info[4][0])
+      if entry not in result:
+        result.append(entry)
+
+  if not loopback:
+    result = [x for x in result if not x[1].startswith('127.')]
+  return result
+
+class ssdpmultiagent(_receiveloop):
+  """Searches on several interfaces at the same time.
+
+  Either local addresses to bind to or interface names (SO_BINDTODEVICE) can
+  be given. If both are omitted, all local IPv4 interfaces are used. IPv6 
+  searches (ff02::c) are sent on the interfaces listed in ipv6, or on all 
+  local interfaces if ipv6 is True. Iterating over this agent yields (message,
+  host, port, interface) tuples, where interface is the address or name the 
+  message was received on.
+  """
+  def __init__(self, ttl: int = 2, addresses: list = None, ifaces: list = None,
+               timeout: float = 5, window: ssdpwindow = None, 
+               bufsize: int = 8192, cache: ssdpcache = None, 
+               ipv6 = None) -> None:
+    self._error__handlers = []
+    self._cache = cache
+    self._bufsize = bufsize
+    self._iter_amount = -1
+    self._timeout = timeout
+    self._window = window
+    self._reason = None
+    self._malformed = 0
+    self._selector = selectors.DefaultSelector()
+    self._agents = []
+
+    if addresses is None and ifaces is None:
+      addresses = [address for _, address in local_interfaces()]
+    for address in addresses or []:
+      self._register(ssdpagent(ttl, address=address), address)
+    for iface in ifaces or []:
+      self._register(ssdpagent(ttl, iface=iface), iface)
+
+    if ipv6 is True:
+      ipv6 = local_interfaces6()
+    for iface in ipv6 or []:
+      try:
+        agent = ssdpagent(ttl, family=socket.AF_INET6, scope_id=iface)
+      except OSError as error:
+        # interface without IPv6 support
+        self._notify_handlers(error)
+        continue
+      self._register(agent, iface)
+
+  def _register(self, agent: ssdpagent, label: str):
+    agent.sock.setblocking(False)
+    self._selector.register(agent.sock, selectors.EVENT_READ, (agent, label))
+    self._agents.append(agent)
+
+  @property
+  def agents(self) -> list:
+    return self._agents
+
+  def add_error_handler(self, handler):
+    if handler: self._error__handlers.append(handler)
+
+  def close(self):
+    self._selector.close()
+    for agent in self._agents:
+      agent.close()
+
+  def write_object(self, obj) -> int:
+    if self._window is not None:
+      self._window.start(obj)
+    count = 0
+    for agent in self._agents:
+      try:
+        count += agent.write_object(obj)
+      except OSError as error:
+        self._notify_handlers(error)
+    return count
+
+  def schedule(self, obj, delay: float = 0):
+    """Sends the given object on all interfaces after delay seconds."""
+    if self._window is not None:
+      self._window.start(obj, delay)
+    for agent in self._agents:
+      agent.schedule(obj, delay)
+
+  def search(self, template: msearchtemplate, schedule: ssdpschedule = None):
+    """Sends the given search according to the schedule while iterating."""
+    if schedule is None:
+      self.write_object(template)
+      return
+    for delay in schedule.delays(template.mx):
+      self.schedule(template, delay)
+
+  def _flush(self) -> float:
+    pending = None
+    for agent in self._agents:
+      delay = agent._flush()
+      if delay is not None and (pending is None or delay < pending):
+        pending = delay
+    return pending
+
+  def _notify_handlers(self, error):
+    for handler in self._error__handlers:
+      handler(error)
+
+  def __iter__(self):
+    self._reason = None
+    counter = 0
+    while self._agents and not self._stopped(counter):
+      pending = self._flush()
+      timeout = self._next_timeout(pending)
+      if timeout is None:
+        break
+
+      events = self._selector.select(timeout)
+      if not events:
+        if self._timed_out(socket.timeout('timed out'), pending is not None):
+          continue
+        break
+
+      for key, _ in events:
+        _, label = key.data
+        try:
+          data, address = key.fileobj.recvfrom(self._bufsize)
+        except BlockingIOError:
+          continue
+        except OSError as error:
+          self._notify_handlers(error)
+          continue
+        message = self._accept(data)
+        if message is None:
+          continue
+        counter += 1
+        yield message, address[0], address[1], label
+
+  def __enter__(self) -> 'ssdpmultiagent':
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is not None:
+      self._notify_handlers(exc_value)
+    self.close()
+
+def ssdp_discover_all(addresses: list = None, ifaces: list = None,
+                      timeout: float = 5, window: ssdpwindow = None,
+                      schedule: ssdpschedule = None, ipv6 = None) -> ssdpresult:
+  """Discovers devices on all given (or all local) interfaces.
+
+  The returned result is merged and deduplicated; ssdphost.interfaces records
+  which interface(s) saw each host.
+  """
+  result = ssdpresult()
+  if window is None:
+    window = ssdpwindow()
+  if schedule is None:
+    schedule = ssdpschedule()
+  with ssdpmultiagent(addresses=addresses, ifaces=ifaces, timeout=timeout,
+                      window=window, ipv6=ipv6) as client:
+    client.search(msearch_template(mx=window.mx), schedule)
+    for packet, address, port, iface in client:
+      _collect(result, packet, address, iface)
+  return result
@@ -0,0 +1,178 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+High-rate receive path for SSDP sockets. Datagrams are drained without blocking
+into preallocated buffers and handed to a separate parse stage through a queue.
+"""
+import queue
+import selectors
+import socket
+import threading
+
+from . import ssdpcache, parse_message
+
+class ssdpstats:
+  """Counters of a ssdpreceiver."""
+  def __init__(self) -> None:
+    self.received = 0
+    self.truncated = 0
+    self.dropped = 0
+    self.malformed = 0
+
+  def __repr__(self) -> str:
+    return '<ssdpstats received=%d, truncated=%d, dropped=%d, malformed=%d>' % (
+      self.received, self.truncated, self.dropped, self.malformed
+    )
+
+class ssdpreceiver:
+  """Receive engine for a (multicast) UDP socket.
+
+  The given socket is switched to non-blocking mode. Each datagram is read with
+  recvfrom_into() into one of the preallocated buffers; datagrams larger than
+  bufsize are counted as truncated, and datagrams that arrive while every 
+  buffer is still waiting to be parsed are counted as dropped. 
+
+  Draining runs in a background thread after start(), parsing takes place 
+  while iterating over the receiver:
+
+  >>> with ssdpagent(address='192.168.0.2') as agent:
+  ...   receiver = ssdpreceiver(agent.sock, rcvbuf=1 << 20)
+  ...   receiver.start()
+  ...   agent.write_object(build_msearch())
+  ...   for message, host, port in receiver.messages(timeout=3):
+  ...     ...
+  ...   receiver.stop()
+  """
+  def __init__(self, sock: socket.socket, bufsize: int = 8192, 
+               rcvbuf: int = None, buffers: int = 256, 
+               cache: ssdpcache = None) -> None:
+    self._sock = sock
+    self._cache = cache
+    self._sock.setblocking(False)
+    if rcvbuf is not None:
+      self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+
+    self._bufsize = bufsize
+    # one additional byte to detect truncated datagrams
+    self._buffers = [bytearray(bufsize + 1) for _ in range(buffers)]
+    self._scratch = bytearray(bufsize + 1)
+    self._free = queue.SimpleQueue()
+    for index in range(buffers):
+      self._free.put(index)
+    self._queue = queue.SimpleQueue()
+
+    self._stats = ssdpstats()
+    self._stopped = threading.Event()
+    self._thread = None
+
+  @property
+  def stats(self) -> ssdpstats:
+    return self._stats
+
+  @property
+  def rcvbuf(self) -> int:
+    """The effective kernel receive buffer size."""
+    return self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+  def drain(self) -> int:
+    """Reads all pending datagrams and returns the amount of queued ones."""
+    queued = 0
+    while True:
+      try:
+        index = self._free.get_nowait()
+      except queue.Empty:
+        index = None
+      buffer = self._scratch if index is None else self._buffers[index]
+
+      try:
+        nbytes, address = self._sock.recvfrom_into(buffer)
+      except (BlockingIOError, InterruptedError):
+        if index is not None: self._free.put(index)
+        return queued
+
+      self._stats.received += 1
+      if index is None:
+        self._stats.dropped += 1
+      elif nbytes > self._bufsize:
+        self._stats.truncated += 1
+        self._free.put(index)
+      else:
+        self._queue.put((index, nbytes, address))
+        queued += 1
+
+  def _run(self):
+    with selectors.DefaultSelector() as selector:
+      selector.register(self._sock, selectors.EVENT_READ)
+      while not self._stopped.is_set():
+        if selector.select(0.1):
+          try:
+            self.drain()
+          except OSError:
+            # socket has been closed
+            break
+    self._queue.put(None)
+
+  def start(self):
+    if self._thread is None:
+      self._stopped.clear()
+      self._thread = threading.Thread(target=self._run, daemon=True)
+      self._thread.start()
+
+  def stop(self):
+    self._stopped.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def messages(self, timeout: float = 5):
+    """Parses queued datagrams and yields (message, host, port) tuples.
+
+    Stops if no datagram has been queued within the given timeout or the 
+    receiver has been stopped.
+    """
+    while True:
+      try:
+        item = self._queue.get(timeout=timeout)
+      except queue.Empty:
+        break
+      if item is None:
+        break
+
+      index, nbytes, address = item
+      try:
+        message = parse_message(memoryview(self._buffers[index])[:nbytes], self._cache)
+      except ValueError:
+        self._stats.malformed += 1
+        continue
+      finally:
+        self._free.put(index)
+      yield message, address[0], address[1]
+
+  def __iter__(self):
+    return self.messages()
+
+  def __enter__(self) -> 'ssdpreceiver':
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
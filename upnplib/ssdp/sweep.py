@@ -0,0 +1,209 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Unicast M-SEARCH sweep across (routed) subnets. Multicast searches never cross
+routers, so every address of the given networks is probed directly at a 
+limited rate.
+"""
+import collections
+import errno
+import ipaddress
+import selectors
+import socket
+import time
+
+from . import (
+  SSDP_PORT,
+
+  man,
+  ssdpcache,
+
+  parse_message,
+  msearch_template
+)
+from .agent import _collect, ssdpresult
+
+# marker replaced by the target address in the pre-serialized search
+_HOST_MARKER = '\x00'
+
+class tokenbucket:
+  """Token bucket allowing rate operations per second with bursts up to burst."""
+  def __init__(self, rate: float, burst: int = None, clock = time.monotonic) -> None:
+    self._rate = rate
+    self._burst = burst if burst is not None else max(1, int(rate / 10))
+    self._tokens = float(self._burst)
+    self._clock = clock
+    self._last = clock()
+
+  def consume(self) -> float:
+    """Takes one token and returns 0, or the seconds until a token is available."""
+    now = self._clock()
+    self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+    self._last = now
+    if self._tokens >= 1:
+      self._tokens -= 1
+      return 0
+    return (1 - self._tokens) / self._rate
+
+class sweepstats:
+  """Counters of a ssdpsweep."""
+  def __init__(self) -> None:
+    self.sent = 0
+    self.errors = 0
+    self.responses = 0
+    self.expired = 0
+    self.malformed = 0
+
+  def __repr__(self) -> str:
+    return '<sweepstats sent=%d, errors=%d, responses=%d, expired=%d, malformed=%d>' % (
+      self.sent, self.errors, self.responses, self.expired, self.malformed
+    )
+
+class ssdpsweep:
+  """Sends unicast M-SEARCH probes to every host of the given networks.
+
+  Probes are sent from a single socket at no more than rate probes per second
+  with at most inflight unanswered probes at a time. A probe is completed by
+  the first response of its host or after timeout seconds. Iterating yields 
+  (message, host, port) tuples as responses arrive:
+
+  >>> for message, host, port in ssdpsweep(['10.20.0.0/16'], rate=500):
+  ...   print(host, message['LOCATION'])
+  """
+  def __init__(self, networks: list, st: str = 'ssdp:all', mx: int = 1,
+               rate: float = 500, inflight: int = 1024, timeout: float = 2,
+               port: int = SSDP_PORT, address: str = None, 
+               bufsize: int = 8192, cache: ssdpcache = None) -> None:
+    self._networks = [ipaddress.ip_network(x, strict=False) for x in networks]
+    self._bucket = tokenbucket(rate)
+    self._max_inflight = inflight
+    self._timeout = timeout
+    self._port = port
+    self._bufsize = bufsize
+    self._cache = cache
+    self._stats = sweepstats()
+
+    # unicast searches carry the target address in the HOST header
+    payload = bytes(msearch_template(_HOST_MARKER, port, man.DISCOVER, st, mx))
+    self._prefix, self._suffix = payload.split(_HOST_MARKER.encode(), 1)
+
+    self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self._sock.setblocking(False)
+    if address is not None:
+      self._sock.bind((address, 0))
+
+  @property
+  def stats(self) -> sweepstats:
+    return self._stats
+
+  def targets(self):
+    for network in self._networks:
+      if network.num_addresses == 1:
+        yield str(network.network_address)
+      else:
+        for host in network.hosts():
+          yield str(host)
+
+  def _send(self, host: str) -> bool:
+    try:
+      self._sock.sendto(self._prefix + host.encode() + self._suffix, (host, self._port))
+    except OSError as error:
+      if error.errno in (errno.EAGAIN, errno.ENOBUFS):
+        # kernel queue is full, try again later
+        return False
+      self._stats.errors += 1
+      return True
+    self._stats.sent += 1
+    return True
+
+  def __iter__(self):
+    targets = self.targets()
+    target = next(targets, None)
+    inflight = {} # host -> deadline
+    deadlines = collections.deque()
+
+    with selectors.DefaultSelector() as selector:
+      selector.register(self._sock, selectors.EVENT_READ)
+      while target is not None or inflight:
+        now = time.monotonic()
+        while deadlines and deadlines[0][0] <= now:
+          deadline, host = deadlines.popleft()
+          if inflight.get(host) == deadline:
+            del inflight[host]
+            self._stats.expired += 1
+
+        wait = 0.05
+        while target is not None and len(inflight) < self._max_inflight:
+          delay = self._bucket.consume()
+          if delay > 0:
+            wait = min(wait, delay)
+            break
+          if not self._send(target):
+            break
+          deadline = now + self._timeout
+          inflight[target] = deadline
+          deadlines.append((deadline, target))
+          target = next(targets, None)
+
+        if deadlines:
+          wait = min(wait, max(0, deadlines[0][0] - now))
+        if not selector.select(wait):
+          continue
+
+        while True:
+          try:
+            data, address = self._sock.recvfrom(self._bufsize)
+          except (BlockingIOError, InterruptedError):
+            break
+          except OSError:
+            # ICMP port unreachable reported for an earlier probe
+            self._stats.errors += 1
+            continue
+          try:
+            message = parse_message(data, self._cache)
+          except ValueError:
+            self._stats.malformed += 1
+            continue
+          self._stats.responses += 1
+          inflight.pop(address[0], None)
+          yield message, address[0], address[1]
+
+  def close(self):
+    self._sock.close()
+
+  def __enter__(self) -> 'ssdpsweep':
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+def ssdp_sweep(networks: list, result: ssdpresult = None, **kwds) -> ssdpresult:
+  """Sweeps the given networks (CIDR notation) and collects all responses.
+
+  Keyword arguments are passed to ssdpsweep.
+  """
+  if result is None:
+    result = ssdpresult()
+  with ssdpsweep(networks, **kwds) as sweep:
+    for packet, address, port in sweep:
+      _collect(result, packet, address)
+  return result
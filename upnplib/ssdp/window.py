@@ -0,0 +1,242 @@
+# MIT License
+# 
+# Copyright (c) 2022 MatrixEditor
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+__doc__ = """
+Completion policy for the M-SEARCH receive window. Devices answer within MX 
+seconds, so there is no need to wait for a fixed socket timeout.
+"""
+import random
+import time
+
+from enum import Enum
+
+from . import Message, msearchtemplate, parse_message
+
+class stopreason(Enum):
+  """Describes why a receive window has been closed."""
+  DEADLINE = 'deadline'
+  QUIET = 'quiet'
+  TIMEOUT = 'timeout'
+  AMOUNT = 'amount'
+  INTERRUPTED = 'interrupted'
+
+class ssdpwindow:
+  """Receive window that derives its deadline from the MX value of a search.
+
+  The window is closed MX + grace seconds after the last search has been 
+  sent, or earlier if no new USN/location has arrived for quiet seconds since
+  the last new one (or the last search). Set quiet to None to wait for the 
+  deadline only.
+  """
+  def __init__(self, mx: int = 2, grace: float = 1.0, quiet: float = 1.0,
+               clock = time.monotonic) -> None:
+    self._mx = mx
+    self._grace = grace
+    self._quiet = quiet
+    self._clock = clock
+    self._started = None
+    self._deadline = None
+    self._last_sent = None
+    self._last_new = None
+    self._seen = set()
+    self._reason = None
+
+  @property
+  def mx(self) -> int:
+    return self._mx
+
+  @property
+  def reason(self) -> stopreason:
+    """The reason why this window has been closed, None while still open."""
+    return self._reason
+
+  @property
+  def deadline(self) -> float:
+    return self._deadline
+
+  def start(self, message: Message = None, delay: float = 0):
+    """Registers a search sent now (or after the given delay).
+
+    MX is taken from the given search message if present. Repeated searches 
+    may only extend the window.
+    """
+    at = self._clock() + delay
+    mx = self._mx
+    if isinstance(message, msearchtemplate):
+      message = message.message
+    if isinstance(message, Message) and 'MX' in message:
+      try:
+        mx = int(message['MX'].value)
+      except ValueError:
+        pass
+
+    if self._started is None:
+      self._started, self._mx = at, mx
+    else:
+      self._started, self._mx = min(self._started, at), max(self._mx, mx)
+    deadline = at + mx + self._grace
+    if self._deadline is None or deadline > self._deadline:
+      self._deadline = deadline
+    if self._last_sent is None or at > self._last_sent:
+      self._last_sent = at
+
+  def update(self, message: Message) -> bool:
+    """Registers a received message and returns True if its USN/location is new."""
+    key = (
+      message['USN'].value if 'USN' in message else None,
+      message['LOCATION'].value if 'LOCATION' in message else None
+    )
+    if key in self._seen:
+      return False
+    self._seen.add(key)
+    self._last_new = self._clock()
+    return True
+
+  def remaining(self) -> float:
+    """Seconds until this window closes; 0 if it has been closed."""
+    if self._reason is not None: return 0
+    if self._started is None: self.start()
+
+    now = self._clock()
+    remaining = self.deadline - now
+    reason = stopreason.DEADLINE
+    if self._quiet is not None and self._last_new is not None:
+      quiet = max(self._last_new, self._last_sent) + self._quiet - now
+      if quiet < remaining:
+        remaining, reason = quiet, stopreason.QUIET
+
+    if remaining <= 0:
+      self._reason = reason
+      return 0
+    return remaining
+
+  def close(self, reason: stopreason):
+    if self._reason is None:
+      self._reason = reason
+
+  def __repr__(self) -> str:
+    return '<ssdpwindow mx=%d, grace=%s, quiet=%s, reason=%s>' % (
+      self._mx, self._grace, self._quiet, self._reason
+    )
+
+class ssdpschedule:
+  """Burst and retransmission schedule for searches within the MX window.
+
+  A search is sent in rounds + 1 rounds spread evenly over the first half of
+  the MX window (or every interval seconds). Each round consists of burst 
+  copies, and every copy is delayed by a random jitter of up to jitter 
+  seconds, so that lost datagrams are recovered within one discovery cycle.
+  """
+  def __init__(self, burst: int = 1, rounds: int = 1, interval: float = None,
+               jitter: float = 0.1, rng: random.Random = None) -> None:
+    self._burst = max(1, burst)
+    self._rounds = max(0, rounds)
+    self._interval = interval
+    self._jitter = jitter
+    self._rng = rng if rng is not None else random.Random()
+
+  def delays(self, mx: int) -> list:
+    """Returns the sorted send delays (in seconds) for a search with MX."""
+    interval = self._interval
+    if interval is None:
+      interval = (mx / 2) / self._rounds if self._rounds else 0
+    delays = []
+    for index in range(self._rounds + 1):
+      for copy in range(self._burst):
+        jitter = self._rng.uniform(0, self._jitter) if index or copy else 0
+        delays.append(index * interval + jitter)
+    return sorted(delays)
+
+  def __repr__(self) -> str:
+    return '<ssdpschedule burst=%d, rounds=%d, jitter=%s>' % (
+      self._burst, self._rounds, self._jitter
+    )
+
+class _receiveloop:
+  """Stop conditions and message handling shared by the receive loops of the
+  SSDP agents.
+
+  Subclasses set _iter_amount, _timeout, _window, _cache, _reason and 
+  _malformed, and implement _notify_handlers().
+  """
+  @property
+  def malformed(self) -> int:
+    """Amount of received datagrams that could not be parsed."""
+    return self._malformed
+
+  @property
+  def reason(self) -> stopreason:
+    """The reason why the last iteration stopped."""
+    return self._reason
+
+  def prepare_iter(self, amount: int):
+    self._iter_amount = amount
+
+  def interrupt(self):
+    self._iter_amount = 0
+
+  def _stopped(self, counter: int) -> bool:
+    """Returns True (with reason set) if counter messages are enough."""
+    if self._iter_amount == 0:
+      self._reason = stopreason.INTERRUPTED
+      return True
+    if self._iter_amount > 0 and self._iter_amount <= counter:
+      self._reason = stopreason.AMOUNT
+      return True
+    return False
+
+  def _next_timeout(self, pending: float = None) -> float: # float | None
+    """Returns the seconds to wait for the next datagram, or None (with reason
+    set) if the window has been closed. pending is the delay until the next
+    scheduled search."""
+    timeout = self._timeout
+    if pending is not None:
+      timeout = min(timeout, pending)
+    if self._window is not None:
+      remaining = self._window.remaining()
+      if remaining <= 0:
+        self._reason = self._window.reason
+        return None
+      timeout = min(timeout, remaining)
+    return timeout
+
+  def _timed_out(self, error: Exception, scheduled: bool = False) -> bool:
+    """Handles a receive timeout and returns True if the iteration continues,
+    which is the case while searches are still scheduled."""
+    if scheduled:
+      return True
+    if self._window is not None and self._window.remaining() <= 0:
+      self._reason = self._window.reason
+    else:
+      self._reason = stopreason.TIMEOUT
+      self._notify_handlers(error)
+    return False
+
+  def _accept(self, data: bytes) -> Message: # Message | None
+    """Parses a received datagram; malformed ones are counted and skipped."""
+    try:
+      message = parse_message(data, self._cache)
+    except ValueError:
+      self._malformed += 1
+      return None
+    if self._window is not None:
+      self._window.update(message)
+    return message
@@ -19,9 +19,19 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import concurrent.futures
+import sys
+import threading
 import xml.etree.ElementTree as xmltree
 import urllib3
 
+from .pool import shared_pools
+
+def _intern(value):
+  # for repeated vocabulary only (names, data types, URNs, direction and eventing
+  # flags); values unique per device would just stay alive in the intern table
+  return sys.intern(value) if type(value) is str else value
+
 def _xmlrelpath(element: xmltree.Element) -> str:
   try:
     return element.tag[element.tag.index('}') + 1:]
@@ -47,48 +57,145 @@ def _xmlnamespace(element: xmltree.Element, key: str) -> dict:
   name = element.tag
   return {key: name[1:name.index('}')]}
 
-def fuzz_request(url_base) -> urllib3.HTTPResponse:
-    base = url_base[7:]
-    manager = urllib3.PoolManager()
-    for url in spliturls(base):
-      while True:
-        response = _fetch_req(url, manager)
-        if response is not None: return response
-        else:
-          nodes = url[7:].split('/')
-          # first, check if there is a file located in 
-          # the url-path  
-          if '.' in nodes[-1]:
-            # Then check if there are any path_nodes left . 
-            # Base length is [address, path_node, file] if
-            # another request could be made.
-            if len(nodes) >= 3:
-              nodes[-2] = nodes[-1]
-              nodes = nodes[:-1]
-              url = 'http://%s' % ('/'.join(nodes))
-              continue
-            break
+def fuzz_request(url_base, manager = None, model: tuple = None) -> urllib3.HTTPResponse:
+  return fuzz_locate(url_base, manager, model)[1]
+
+# successful rewrite rules by 'host:port' and by (manufacturer, modelName)
+_fuzz_rules = {}
+_fuzz_lock = threading.Lock()
+
+def fuzz_locate(url_base, manager = None, model: tuple = None, workers: int = 4,
+                preload: bool = True) -> tuple: # tuple[str, HTTPResponse] | tuple[None, None]
+  """Resolves url_base to a fetchable url and returns (url, response).
+
+  The rewritten urls of fuzz_candidates() are probed concurrently by up to 
+  workers threads. The highest ranked url that answers with 200 is used as
+  soon as all urls ranked before it have failed, and the remaining probes 
+  are cancelled, so the result matches probing one url after another. The rewrite rule that 
+  succeeded is remembered for the host and for model, e.g. (manufacturer, 
+  modelName), so further documents of the same host or model are usually 
+  resolved by a single request.
+
+  If preload is False, the body of the returned response has not been read
+  yet, so that it can be streamed; the caller has to release the response.
+  """
+  if manager is None: manager = shared_pools()
+  nodes = url_base[7:].split('/')
+  # devices without manufacturer and model name must not share a rule
+  keys = [nodes[0]] + ([model] if model and any(model) else [])
+
+  tried = set()
+  for key in keys:
+    rule = _fuzz_rules.get(key)
+    if rule is None or rule[0] != len(nodes): continue
+    url = _fuzz_apply(nodes, rule[1])
+    if url in tried: continue
+    tried.add(url)
+    response = _fetch_req(url, manager, preload)
+    if response is not None:
+      _fuzz_remember(keys, len(nodes), rule[1])
+      return url, response
+
+  candidates = [c for c in fuzz_candidates(url_base) if c[0] not in tried]
+  if not candidates: return None, None
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+  futures = [executor.submit(_fetch_req, url, manager, preload) for url, _ in candidates]
+  try:
+    for index, ((url, rule), future) in enumerate(zip(candidates, futures)):
+      response = future.result()
+      if response is not None:
+        _fuzz_remember(keys, len(nodes), rule)
+        if not preload:
+          # unread responses of lower ranked probes hold a connection
+          for other in futures[index + 1:]:
+            other.add_done_callback(_discard_probe)
+        return url, response
+  finally:
+    # probes still waiting for a timeout are not waited for
+    executor.shutdown(wait=False, cancel_futures=True)
+  return None, None
+
+def fuzz_candidates(url_base) -> list: # list[tuple[str, tuple[int]]]
+  """Returns all urls fuzz_locate() tries for url_base in their order.
+
+  Each url comes with its rewrite rule, the indices of the path nodes of 
+  url_base (index 0 is the address) it is made of.
+  """
+  nodes = url_base[7:].split('/')
+  result = []
+  seen = set()
+  for indices in _split_indices(nodes):
+    while True:
+      url = _fuzz_apply(nodes, indices)
+      if url not in seen:
+        seen.add(url)
+        result.append((url, indices))
+      current = [nodes[i] for i in indices]
+      # first, check if there is a file located in 
+      # the url-path  
+      if '.' in current[-1]:
+        # Then check if there are any path_nodes left . 
+        # Base length is [address, path_node, file] if
+        # another request could be made.
+        if len(indices) >= 3:
+          indices = indices[:-2] + indices[-1:]
+          continue
+        break
+      else:
+        # In this case a '/' is at the end of the url:
+        # parts: [address, path_node, '']
+        if len(indices) >= 3:
+          if '' == current[-1]:
+            indices = indices[:-2]
           else:
-            # In this case a '/' is at the end of the url:
-            # parts: [address, path_node, '']
-            if len(nodes) >= 3:
-              if '' == nodes[-1]:
-                nodes = nodes[:-2]
-              else:
-                nodes[-2] = nodes[-1]
-                nodes = nodes[:-1]
-              url = 'http://%s' % ('/'.join(nodes))
-              continue
-            else: break
-  
-def _fetch_req(url: str, manager: urllib3.PoolManager) -> urllib3.HTTPResponse:
+            indices = indices[:-2] + indices[-1:]
+          continue
+        else: break
+  return result
+
+def _split_indices(nodes: list) -> list:
+  # spliturls() on node indices
+  last = len(nodes) - 1
+  inner = range(1, last)
+  result = [(0, last)]
+  for i in inner:
+    current = (0, i) + tuple(j for j in inner if nodes[j] != nodes[i]) + (last,)
+    if current not in result:
+      result.append(current)
+  return result
+
+def _fuzz_apply(nodes: list, indices: tuple) -> str:
+  return 'http://%s' % '/'.join(nodes[i] for i in indices)
+
+def _fuzz_remember(keys: list, count: int, indices: tuple) -> None:
+  with _fuzz_lock:
+    for key in keys:
+      _fuzz_rules[key] = (count, indices)
+
+def forget_fuzz_rules() -> None:
+  """Clears all remembered rewrite rules of fuzz_locate()."""
+  with _fuzz_lock:
+    _fuzz_rules.clear()
+
+def _fetch_req(url: str, manager, preload: bool = True) -> urllib3.HTTPResponse:
   try:
-    response = manager.request('GET', url)
+    response = manager.request('GET', url, preload_content=preload)
   except:
     return None
   else:
     if response.status == 200:
       return response
+    if not preload:
+      discard_response(response)
+
+def discard_response(response: urllib3.HTTPResponse) -> None:
+  """Drops an unread response without returning its connection to the pool."""
+  response.close()
+  response.release_conn()
+
+def _discard_probe(future) -> None:
+  if not future.cancelled() and future.result() is not None:
+    discard_response(future.result())
 
 def spliturls(base: str) -> list:
   nodes = base.split('/')